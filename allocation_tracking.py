@@ -0,0 +1,168 @@
+# allocation_tracking.py
+"""Per-frame memory allocation of the simulation's subsystems, via tracemalloc.
+
+The loop calls begin() before and end(subsystem) after each call into a
+subsystem. For every frame the tracker records, per subsystem, the most
+memory the calls held above what was allocated when they began, which
+counts temporaries freed before returning, and the net change in live
+memory blocks. At each stage change it compares tracemalloc snapshots to
+find the source lines whose allocations grew most during the stage.
+
+tracemalloc sees Python objects and NumPy arrays. Surface pixel buffers come
+from SDL's allocator, so they show up only in the peak RSS (and the Surface
+objects in the site counts). While disabled, begin() and end() return at once.
+
+tracemalloc.reset_peak() is new in Python 3.9. Before that, each call is
+measured by the net change in allocated memory instead, which leaves out
+temporaries freed before it returned.
+"""
+import sys
+import tracemalloc
+
+from constants import ALLOCATION_TOP_SITES
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Whether a call's allocations can include the temporaries it freed again
+PEAK_AVAILABLE = hasattr(tracemalloc, "reset_peak")
+
+# Subsystems, named apart from the frame timer's sections
+PARTICLE_ALLOCATIONS = "particles"
+SPAWN_ALLOCATIONS = "spawn"
+UI_ALLOCATIONS = "ui"
+END_SEQUENCE_ALLOCATIONS = "end_sequence"
+SUBSYSTEMS = (PARTICLE_ALLOCATIONS, SPAWN_ALLOCATIONS, UI_ALLOCATIONS, END_SEQUENCE_ALLOCATIONS)
+
+
+def peak_rss():
+    """Peak resident set size of this process in bytes, or None where it is unknown"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class _StageAllocations:
+    def __init__(self):
+        self.frames = 0
+        self.bytes = dict.fromkeys(SUBSYSTEMS, 0)
+        self.max_bytes = dict.fromkeys(SUBSYSTEMS, 0)
+        self.blocks = dict.fromkeys(SUBSYSTEMS, 0)
+        self.top_sites = []
+        self.peak_rss = None
+
+
+class AllocationTracker:
+    """Bytes and blocks allocated per frame by each subsystem, grouped by stage"""
+
+    def __init__(self, top_sites: int = ALLOCATION_TOP_SITES):
+        self.top_sites = top_sites
+        self.enabled = False
+        self.stages = {}
+        self.peak_traced = 0
+        self._stage = None
+        self._stage_snapshot = None
+        self._frame_bytes = dict.fromkeys(SUBSYSTEMS, 0)
+        self._frame_blocks = dict.fromkeys(SUBSYSTEMS, 0)
+        self._start_bytes = 0
+        self._start_blocks = 0
+
+    def start(self, stage):
+        """Start tracing allocations, counting from `stage`"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.enabled = True
+        self._begin_stage(stage)
+
+    def stop(self) -> dict:
+        """Stop tracing; returns the report()"""
+        if self.enabled:
+            self.peak_traced = max(self.peak_traced, tracemalloc.get_traced_memory()[1])
+            self._end_stage()
+            self.enabled = False
+            tracemalloc.stop()
+        return self.report()
+
+    def begin(self):
+        """Mark the start of a call into a subsystem"""
+        if not self.enabled:
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        self.peak_traced = max(self.peak_traced, peak)
+        if PEAK_AVAILABLE:
+            tracemalloc.reset_peak()
+        self._start_bytes = current
+        # Blocks last, once this method's own allocations are freed
+        del peak
+        self._start_blocks = sys.getallocatedblocks()
+
+    def end(self, subsystem: str):
+        """Add what the call since begin() allocated to `subsystem` of the current frame"""
+        if not self.enabled:
+            return
+        # Blocks first, before this method allocates any
+        blocks = sys.getallocatedblocks() - self._start_blocks
+        current, peak = tracemalloc.get_traced_memory()
+        used = peak if PEAK_AVAILABLE else current
+        self._frame_bytes[subsystem] += used - self._start_bytes
+        self._frame_blocks[subsystem] += blocks
+
+    def end_frame(self):
+        """Close the current frame and add it to the current stage"""
+        if not self.enabled:
+            return
+        stage = self.stages[self._stage]
+        stage.frames += 1
+        for subsystem in SUBSYSTEMS:
+            allocated = self._frame_bytes[subsystem]
+            stage.bytes[subsystem] += allocated
+            stage.max_bytes[subsystem] = max(stage.max_bytes[subsystem], allocated)
+            stage.blocks[subsystem] += self._frame_blocks[subsystem]
+            self._frame_bytes[subsystem] = 0
+            self._frame_blocks[subsystem] = 0
+
+    def stage_changed(self, stage):
+        if not self.enabled or stage == self._stage:
+            return
+        self._end_stage()
+        self._begin_stage(stage)
+
+    def _begin_stage(self, stage):
+        self._stage = stage
+        self.stages.setdefault(stage, _StageAllocations())
+        self._stage_snapshot = self._snapshot()
+
+    def _end_stage(self):
+        stage = self.stages[self._stage]
+        # A stage seen twice keeps the sites of its latest visit
+        growth = self._snapshot().compare_to(self._stage_snapshot, "lineno")
+        stage.top_sites = [(str(stat.traceback[0]), stat.size_diff, stat.count_diff)
+                           for stat in growth[:self.top_sites] if stat.size_diff > 0]
+        stage.peak_rss = peak_rss()
+
+    def _snapshot(self):
+        # Without the snapshots tracemalloc keeps of itself
+        return tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+
+    def report(self) -> dict:
+        """Per stage: mean and max bytes per frame and mean net blocks per frame of
+        each subsystem, the top allocation sites and the peak RSS at its end"""
+        stages = {}
+        for name, stage in self.stages.items():
+            frames = max(stage.frames, 1)
+            stages[name] = {
+                "frames": stage.frames,
+                "subsystems": {subsystem: {"mean_bytes": stage.bytes[subsystem] / frames,
+                                           "max_bytes": stage.max_bytes[subsystem],
+                                           "mean_blocks": stage.blocks[subsystem] / frames}
+                               for subsystem in SUBSYSTEMS},
+                "top_sites": [{"site": site, "bytes": size, "blocks": count}
+                              for site, size, count in stage.top_sites],
+                "peak_rss": stage.peak_rss,
+            }
+        return {"stages": stages, "peak_traced": self.peak_traced, "peak_rss": peak_rss(),
+                "includes_temporaries": PEAK_AVAILABLE}
@@ -0,0 +1,493 @@
+# benchmark.py
+"""Offscreen performance benchmarks.
+
+    python benchmark.py particles [--counts 1000 10000 100000] [--frames 100] [--legacy]
+    python benchmark.py draw [--counts 1000 10000 20000 50000 100000] [--frames 100]
+    python benchmark.py overlay [--frames 600]
+    python benchmark.py end-sequence [--frames 300]
+    python benchmark.py frame-ring [--frames 300]
+    python benchmark.py suite [--frames 300] [--multipliers 10 100] [--output FILE]
+                              [--baseline FILE] [--threshold 0.25]
+"""
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import argparse
+import json
+import math
+import pickle
+import random
+import tempfile
+import time
+
+import numpy as np
+import pygame
+from constants import *
+from end_sequence import EndSequenceManager
+from frame_ring import FrameRingReader, FrameRingWriter
+from particles import PARTICLE_KINDS, ParticleSystem
+from simulation import EconomySimulation
+from stage_manager import StageManager
+from ui_manager import UIManager
+
+COLORS = [GOLD, BLUE, GREEN, RED, ORANGE]
+
+
+def _random_path(rng):
+    return (rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT),
+            rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT))
+
+
+def _report(label, update_times, draw_times):
+    update_ms = 1000 * sum(update_times) / len(update_times)
+    draw_ms = 1000 * sum(draw_times) / len(draw_times)
+    worst_ms = 1000 * max(u + d for u, d in zip(update_times, draw_times))
+    print(f"{label:>28}  update {update_ms:8.3f} ms  draw {draw_ms:8.3f} ms  worst {worst_ms:8.3f} ms")
+
+
+def bench_particle_system(screen, count, frames, rng):
+    system = ParticleSystem(max_particles=count)
+    update_times, draw_times = [], []
+
+    for _ in range(frames + 10):
+        # Top the population back up so it stays at `count` live particles
+        while len(system) < count:
+            system.spawn(*_random_path(rng), rng.choice(COLORS))
+
+        start = time.perf_counter()
+        system.update()
+        middle = time.perf_counter()
+        system.draw(screen)
+        end = time.perf_counter()
+
+        update_times.append(middle - start)
+        draw_times.append(end - middle)
+
+    return update_times[10:], draw_times[10:]
+
+
+# The per-object particles ParticleSystem replaced, kept as the --legacy baseline
+class Particle:
+    __slots__ = ("x", "y", "target_x", "target_y", "color", "speed", "size", "alive")
+
+    def __init__(self, x: float, y: float, target_x: float, target_y: float, color, speed: float = 3):
+        self.x = x
+        self.y = y
+        self.target_x = target_x
+        self.target_y = target_y
+        self.color = color
+        self.speed = speed
+        self.size = 5
+        self.alive = True
+
+    def update(self):
+        dx = self.target_x - self.x
+        dy = self.target_y - self.y
+        distance = math.sqrt(dx ** 2 + dy ** 2)
+
+        if distance < self.speed:
+            self.alive = False
+            return
+
+        dx = dx / distance * self.speed
+        dy = dy / distance * self.speed
+
+        self.x += dx
+        self.y += dy
+
+    def draw(self, screen):
+        pygame.draw.circle(screen, self.color, (int(self.x), int(self.y)), self.size)
+
+class UnrestParticle(Particle):
+    __slots__ = ()
+
+    def __init__(self, x: float, y: float, target_x: float, target_y: float):
+        super().__init__(x, y, target_x, target_y, DARK_RED, speed=4)
+        self.size = 7
+
+class MachineAttackParticle(Particle):
+    __slots__ = ()
+
+    def __init__(self, x: float, y: float, target_x: float, target_y: float):
+        super().__init__(x, y, target_x, target_y, PURPLE, speed=5)
+        self.size = 8
+
+
+def bench_particle_lists(screen, count, frames, rng):
+    """The list-copy-and-remove loop ParticleSystem replaced, for comparison"""
+    particles = []
+    update_times, draw_times = [], []
+
+    for _ in range(frames + 10):
+        while len(particles) < count:
+            particles.append(Particle(*_random_path(rng), rng.choice(COLORS)))
+
+        start = time.perf_counter()
+        for particle in particles[:]:
+            particle.update()
+            if not particle.alive:
+                particles.remove(particle)
+        middle = time.perf_counter()
+        for particle in particles:
+            particle.draw(screen)
+        end = time.perf_counter()
+
+        update_times.append(middle - start)
+        draw_times.append(end - middle)
+
+    return update_times[10:], draw_times[10:]
+
+
+def _draw_circles(system, screen):
+    """One pygame.draw.circle call per particle, as before the sprite cache"""
+    n = system.count
+    x, y = system.positions_at(system.tick)
+    xs = x.astype(np.int32).tolist()
+    ys = y.astype(np.int32).tolist()
+    sizes = system.size[:n].tolist()
+    colors = [tuple(color) for color in system.color[:n].tolist()]
+    for kind in PARTICLE_KINDS:
+        for i in np.flatnonzero(system.kind[:n] == kind).tolist():
+            pygame.draw.circle(screen, colors[i], (xs[i], ys[i]), sizes[i])
+
+
+def _time_draw(draw, system, screen, frames):
+    times = []
+    for _ in range(frames):
+        screen.fill(WHITE)
+        start = time.perf_counter()
+        draw(system, screen)
+        times.append(time.perf_counter() - start)
+    return 1000 * sum(times) / len(times)
+
+
+def run_draw(args):
+    screen = pygame.display.get_surface()
+    for count in args.counts:
+        rng = random.Random(count)
+        system = ParticleSystem(max_particles=count)
+        while len(system) < count:
+            kind = rng.randrange(3)
+            if kind == 0:
+                system.spawn(*_random_path(rng), rng.choice(COLORS))
+            elif kind == 1:
+                system.spawn_unrest(*_random_path(rng))
+            else:
+                system.spawn_machine_attack(*_random_path(rng))
+        system.update()
+
+        circles_ms = _time_draw(_draw_circles, system, screen, args.frames)
+        blits_ms = _time_draw(ParticleSystem.draw_blits, system, screen, args.frames)
+        splat_ms = _time_draw(ParticleSystem.draw_splat, system, screen, args.frames)
+        print(f"{count:>8} particles  draw.circle {circles_ms:8.3f} ms  "
+              f"blits {blits_ms:8.3f} ms  splat {splat_ms:8.3f} ms")
+
+
+def _surface_bytes(surface):
+    width, height = surface.get_size()
+    return width * height * surface.get_bytesize()
+
+
+def _legacy_warning_overlay(screen, font, warning_alpha):
+    """UIManager.draw_warning_overlay as it was before the overlay was cached.
+
+    Returns the number of pixel-buffer bytes it allocated.
+    """
+    warning_surface = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
+    warning_color = (255, 0, 0, warning_alpha)
+    pygame.draw.rect(warning_surface, warning_color, (0, 0, WIDTH, HEIGHT))
+
+    text_surface = font.render("CIVIL UNREST", True, RED)
+    text_rect = text_surface.get_rect(center=(WIDTH // 2, HEIGHT - 50))
+
+    screen.blit(warning_surface, (0, 0))
+    screen.blit(text_surface, text_rect)
+    return _surface_bytes(warning_surface) + _surface_bytes(text_surface)
+
+
+def run_overlay(args):
+    screen = pygame.display.get_surface()
+    font = pygame.font.Font(None, 36)
+    ui = UIManager(screen, font, font, font)
+
+    def cached(warning_alpha):
+        misses = ui.text_cache.misses
+        ui.draw_warning_overlay(UNREST, warning_alpha)
+        # Only a text cache miss renders a new surface
+        return _surface_bytes(ui.text_cache.render(font, "CIVIL UNREST", RED)) * (ui.text_cache.misses - misses)
+
+    for label, draw in (("per-frame SRCALPHA surface", lambda alpha: _legacy_warning_overlay(screen, font, alpha)),
+                        ("cached surface + set_alpha", cached)):
+        stage_manager = StageManager()
+        times, allocated = [], 0
+        for _ in range(args.frames):
+            stage_manager.update_warning()
+            screen.fill(WHITE)
+            start = time.perf_counter()
+            allocated += draw(stage_manager.warning_alpha)
+            times.append(time.perf_counter() - start)
+
+        mean_ms = 1000 * sum(times) / len(times)
+        worst_ms = 1000 * max(times)
+        per_frame_kb = allocated / args.frames / 1024
+        print(f"{label:>28}  mean {mean_ms:7.3f} ms  worst {worst_ms:7.3f} ms  "
+              f"pixel buffers allocated {per_frame_kb:9.1f} KiB/frame")
+
+
+class LegacyEndSequence(EndSequenceManager):
+    """Machine drawing as it was before the sprite atlas and machine layer:
+    one new SRCALPHA surface per machine per frame"""
+
+    def _blit_machine(self, pos, alpha):
+        circle_surface = pygame.Surface((SMALL_RADIUS * 2 + 2, SMALL_RADIUS * 2 + 2), pygame.SRCALPHA)
+        pygame.draw.circle(circle_surface, (*BLUE[:3], alpha),
+                           (SMALL_RADIUS + 1, SMALL_RADIUS + 1), SMALL_RADIUS)
+        self.screen.blit(circle_surface,
+                         (pos[0] - SMALL_RADIUS - 1, pos[1] - SMALL_RADIUS - 1))
+
+    def _draw_replication_machines(self):
+        for i in range(self.active_machines):
+            alpha = min(255, (self.timer - (i * 2)) * 15)
+            if alpha > 0:
+                self._blit_machine(self.machine_positions[i], alpha)
+
+    def _draw_machine_field(self, alpha):
+        for pos in self.machine_positions:
+            self._blit_machine(pos, alpha)
+
+
+def _time_end_sequence(manager_class, screen, font, big_font, frames):
+    manager = manager_class(screen, font, big_font, rng=random.Random(0))
+    business_pos, workers_pos = (400, 150), (650, 150)
+    results = {}
+    for stage in (MACHINE_REPLICATION, AI_ALIGNMENT, END_STATE):
+        manager.reset_timer()
+        times = []
+        for _ in range(frames):
+            screen.fill(WHITE)
+            start = time.perf_counter()
+            manager.update(stage)
+            manager.draw(stage, business_pos, workers_pos)
+            times.append(time.perf_counter() - start)
+            manager.check_phase_complete(stage)
+        results[stage] = (1000 * sum(times) / len(times), 1000 * max(times))
+    return results
+
+
+def run_end_sequence(args):
+    screen = pygame.display.get_surface()
+    font = pygame.font.Font(None, 36)
+    big_font = pygame.font.Font(None, 48)
+    for label, manager_class in (("per-machine surfaces", LegacyEndSequence),
+                                 ("current", EndSequenceManager)):
+        results = _time_end_sequence(manager_class, screen, font, big_font, args.frames)
+        for stage, (mean_ms, worst_ms) in results.items():
+            print(f"{label:>22}  {STAGE_NAMES[stage]:>20}  mean {mean_ms:7.3f} ms  worst {worst_ms:7.3f} ms")
+
+
+def run_frame_ring(args):
+    screen = pygame.display.get_surface()
+    screen.fill(WHITE)
+    pygame.draw.circle(screen, BLUE, (WIDTH // 2, HEIGHT // 2), BASE_RADIUS)
+
+    def pickled():
+        pickle.loads(pickle.dumps(pygame.image.tostring(screen, "RGB"), pickle.HIGHEST_PROTOCOL))
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "frames")
+        with FrameRingWriter.for_surface(path, screen) as writer, FrameRingReader(path) as reader:
+            def ring():
+                writer.write(screen)
+                reader.read()
+                reader.release()
+
+            for label, handoff in (("tostring + pickle", pickled), ("frame ring", ring)):
+                times = []
+                for _ in range(args.frames):
+                    start = time.perf_counter()
+                    handoff()
+                    times.append(time.perf_counter() - start)
+                mean_ms = 1000 * sum(times) / len(times)
+                print(f"{label:>18}  mean {mean_ms:7.3f} ms per {WIDTH}x{HEIGHT} frame")
+
+
+STAGES = (TRADITIONAL, AI_TRANSITION, AI_MATURE, INEQUALITY, UNREST, POST_UNREST, MACHINE_TAKEOVER,
+          MACHINE_SURVIVAL, MACHINE_REPLICATION, AI_ALIGNMENT, END_STATE)
+SPAWNING_STAGES = STAGES[:STAGES.index(MACHINE_SURVIVAL)]
+SUITE_PHASES = ("update", "spawn", "draw", "present", "total")
+PERCENTILES = (50, 95, 99)
+
+
+def _time_simulation(stage, frames, spawn_multiplier, seed):
+    """Per-frame update, spawn, draw and present times of a simulation started at `stage`.
+
+    The stress variants call spawn_particles() `spawn_multiplier` times a
+    frame, and attacks never complete so the attack stages keep spawning.
+    Stops early if the stage completes by itself.
+    """
+    simulation = EconomySimulation(headless=True, seed=seed)
+    while simulation.stage_manager.stage != stage:
+        simulation.advance()
+    if spawn_multiplier > 1:
+        simulation.stage_manager.attacks_needed = float("inf")
+
+    # Spawning and presenting are timed through wrappers, so the frame runs
+    # the simulation's own update() and render()
+    spent = {"spawn": 0.0, "present": 0.0}
+    spawn_particles = simulation.spawn_particles
+    present = simulation.present
+
+    def timed_spawn(frame_count):
+        start = time.perf_counter()
+        for _ in range(spawn_multiplier):
+            spawn_particles(frame_count)
+        spent["spawn"] += time.perf_counter() - start
+
+    def timed_present():
+        start = time.perf_counter()
+        present()
+        spent["present"] += time.perf_counter() - start
+
+    simulation.spawn_particles = timed_spawn
+    simulation.present = timed_present
+
+    times = {phase: [] for phase in SUITE_PHASES}
+    for _ in range(frames):
+        if simulation.stage_manager.stage != stage:
+            break
+        spent["spawn"] = spent["present"] = 0.0
+        start = time.perf_counter()
+        simulation.update()
+        updated = time.perf_counter()
+        simulation.render()
+        end = time.perf_counter()
+
+        times["update"].append(updated - start - spent["spawn"])
+        times["spawn"].append(spent["spawn"])
+        times["draw"].append(end - updated - spent["present"])
+        times["present"].append(spent["present"])
+        times["total"].append(end - start)
+    return times
+
+
+def _percentiles(times):
+    values = np.percentile(np.array(times) * 1000, PERCENTILES)
+    return {f"p{percentile}": round(float(value), 4) for percentile, value in zip(PERCENTILES, values)}
+
+
+def _compare(results, baseline, threshold):
+    """Print how total frame times moved against the baseline; returns the regressed cases"""
+    regressions = []
+    for case, result in results.items():
+        if case not in baseline:
+            continue
+        for percentile in ("p50", "p95"):
+            before = baseline[case]["total"][percentile]
+            after = result["total"][percentile]
+            change = (after - before) / before if before else 0.0
+            if change > threshold:
+                regressions.append(case)
+                marker = "REGRESSION"
+            elif change < -threshold:
+                marker = "faster"
+            else:
+                continue
+            print(f"{case:>28}  total {percentile} {before:8.3f} -> {after:8.3f} ms "
+                  f"({change:+.0%})  {marker}")
+    return sorted(set(regressions))
+
+
+def run_suite(args):
+    results = {}
+    cases = [(stage, 1) for stage in STAGES]
+    cases += [(stage, multiplier) for multiplier in args.multipliers for stage in SPAWNING_STAGES]
+    for stage, multiplier in cases:
+        case = stage if multiplier == 1 else f"{stage} x{multiplier}"
+        times = _time_simulation(stage, args.frames, multiplier, args.seed)
+        results[case] = {"frames": len(times["total"])}
+        results[case].update((phase, _percentiles(times[phase])) for phase in SUITE_PHASES)
+        print(f"{case:>28}  " + "  ".join(
+            f"{phase} " + "/".join(f"{value:.3f}" for value in results[case][phase].values())
+            for phase in SUITE_PHASES) + "  ms (p50/p95/p99)")
+
+    with open(args.output, "w") as file:
+        json.dump({"frames": args.frames, "seed": args.seed, "results": results}, file, indent=2)
+    print(f"results written to {args.output}")
+
+    if args.baseline is None:
+        return 0
+    with open(args.baseline) as file:
+        baseline = json.load(file)["results"]
+    regressions = _compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} cases regressed by more than {args.threshold:.0%}")
+        return 1
+    print(f"no case regressed by more than {args.threshold:.0%}")
+    return 0
+
+
+def run_particles(args):
+    screen = pygame.display.get_surface()
+    for count in args.counts:
+        rng = random.Random(count)
+        _report(f"ParticleSystem {count}", *bench_particle_system(screen, count, args.frames, rng))
+        if args.legacy:
+            rng = random.Random(count)
+            _report(f"list {count}", *bench_particle_lists(screen, count, args.frames, rng))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Economic Flow Visualization benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark")
+    subparsers.required = True
+
+    particles = subparsers.add_parser("particles", help="frame time at increasing live particle counts")
+    particles.add_argument("--counts", type=int, nargs="+", default=[1000, 10000, 100000])
+    particles.add_argument("--frames", type=int, default=100)
+    particles.add_argument("--legacy", action="store_true",
+                           help="also time the old per-object particle lists")
+    particles.set_defaults(func=run_particles)
+
+    draw = subparsers.add_parser("draw", help="per-call circles, cached sprite blits and surfarray splats")
+    draw.add_argument("--counts", type=int, nargs="+", default=[1000, 10000, 20000, 50000, 100000])
+    draw.add_argument("--frames", type=int, default=100)
+    draw.set_defaults(func=run_draw)
+
+    overlay = subparsers.add_parser("overlay", help="warning overlay time and allocations, before and after caching")
+    overlay.add_argument("--frames", type=int, default=600)
+    overlay.set_defaults(func=run_overlay)
+
+    end_sequence = subparsers.add_parser("end-sequence",
+                                         help="replication, alignment and end phase frame time")
+    end_sequence.add_argument("--frames", type=int, default=300)
+    end_sequence.set_defaults(func=run_end_sequence)
+
+    frame_ring = subparsers.add_parser("frame-ring",
+                                       help="frame handoff through pickling against the shared-memory ring")
+    frame_ring.add_argument("--frames", type=int, default=300)
+    frame_ring.set_defaults(func=run_frame_ring)
+
+    suite = subparsers.add_parser("suite",
+                                  help="every stage and spawn-rate stress variants through EconomySimulation, "
+                                       "as JSON, optionally checked against a baseline")
+    suite.add_argument("--frames", type=int, default=300, help="frames timed per case")
+    suite.add_argument("--multipliers", type=int, nargs="*", default=[10, 100],
+                       help="spawn-rate multipliers of the stress variants")
+    suite.add_argument("--seed", type=int, default=0)
+    suite.add_argument("--output", default="benchmark-suite.json", help="where to write the results")
+    suite.add_argument("--baseline", help="earlier results to compare against")
+    suite.add_argument("--threshold", type=float, default=0.25,
+                       help="relative slowdown of a case's p50 or p95 frame time that counts as a regression")
+    suite.set_defaults(func=run_suite)
+
+    args = parser.parse_args()
+    pygame.init()
+    pygame.display.set_mode((WIDTH, HEIGHT))
+    status = args.func(args)
+    pygame.quit()
+    return status
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -3,6 +3,9 @@
 WIDTH = 800
 HEIGHT = 800
 FPS = 60
+RENDER_FPS = 144  # Cap on interactively rendered frames per second; the simulation steps at FPS
+MAX_FRAME_TIME = 0.25  # Longest wall-clock gap in seconds the fixed-step loop catches up on
+TIME_SCALES = (1, 2, 8, 32)  # Fast-forward speeds selected with the keys 1 to 4
 
 # Colors
 WHITE = (255, 255, 255)
@@ -21,6 +24,25 @@ SMALL_RADIUS = 10
 TRANSITION_SPEED = 0.1
 ATTACK_COMPLETION_DELAY = 1000
 FINAL_DISPLAY_TIME = 10000
+MAX_PARTICLES = 10000  # Live particle cap; spawns beyond it are dropped
+SPLAT_THRESHOLD = 50000  # Live count above which particles are rasterized with surfarray
+TEXT_CACHE_SIZE = 64  # Rendered text surfaces kept by the shared text cache
+DIRTY_RECT_TILE = 32  # Tile size in pixels for dirty-rect tracking
+DIRTY_RECT_MAX_AREA = 0.5  # Dirty screen fraction above which a full flip is used
+MACHINE_COUNT = 1000  # Positions in the Poisson-disc machine layout
+MAX_MACHINES = 600  # Machines replicated before the replication phase can end
+TIMELINE_STAGE_FRAMES = 300  # Frames each stage is shown before a scripted advance
+TIMELINE_END_FRAMES = 180  # Frames of the end state shown before a scripted run stops
+EXPORT_MAX_PENDING = 32  # Frames queued for PNG encoding before the exporter waits
+EXPORT_COMPRESSION = 6  # zlib level for exported PNG frames
+EXPORT_SEGMENT_FRAMES = 240  # Frames per independently rendered segment of a parallel export
+FRAME_RING_SLOTS = 8  # Frames held by the shared-memory frame ring
+FRAME_RING_POLL = 0.001  # Seconds between checks while waiting on the frame ring
+FRAME_TIMING_FRAMES = 240  # Frames kept by the frame timer's ring buffer
+FRAME_TIMING_HUD_REFRESH = 15  # Frames between updates of the timing HUD text
+TRACE_FLUSH_EVENTS = 2048  # Trace events collected before they are handed to the writer thread
+PROFILE_SAMPLE_INTERVAL = 0.001  # Seconds between stack samples of a sampled stage profile
+ALLOCATION_TOP_SITES = 10  # Source lines listed per stage by the allocation tracker
 
 # Economic stages
 TRADITIONAL = "traditional"
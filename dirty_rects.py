@@ -0,0 +1,89 @@
+# dirty_rects.py
+import numpy as np
+import pygame
+from constants import DIRTY_RECT_TILE, DIRTY_RECT_MAX_AREA
+
+
+class DirtyRectTracker:
+    """Collects the screen areas that changed and presents only those.
+
+    Changes are recorded on a coarse tile grid so that thousands of particle
+    boxes collapse into a few row-merged rects. Each frame presents the tiles
+    touched this frame and the previous one, so areas that particles just
+    left are repainted too. Large changes fall back to a full flip.
+    """
+
+    def __init__(self, width: int, height: int, tile: int = DIRTY_RECT_TILE,
+                 max_area: float = DIRTY_RECT_MAX_AREA):
+        self.tile = tile
+        self.max_area = max_area
+        self._columns = -(-width // tile)
+        self._rows = -(-height // tile)
+        self._current = np.zeros((self._columns, self._rows), dtype=bool)
+        self._previous = np.zeros_like(self._current)
+        self._full = True
+
+        # Presentation counters
+        self.partial_updates = 0
+        self.full_flips = 0
+
+    def invalidate(self):
+        """Present the whole screen this frame"""
+        self._full = True
+
+    def mark_rect(self, rect):
+        rect = pygame.Rect(rect)
+        self.mark_boxes(np.array([rect.x]), np.array([rect.y]),
+                        np.array([rect.w]), np.array([rect.h]))
+
+    def mark_boxes(self, left, top, width, height):
+        """Mark every tile overlapped by the given boxes (arrays of equal length)"""
+        if len(left) == 0:
+            return
+        right = left + width - 1
+        bottom = top + height - 1
+        visible = (right >= 0) & (bottom >= 0) & (left < self._columns * self.tile) & (top < self._rows * self.tile)
+        first_col = np.clip(left[visible] // self.tile, 0, self._columns - 1)
+        last_col = np.clip(right[visible] // self.tile, 0, self._columns - 1)
+        first_row = np.clip(top[visible] // self.tile, 0, self._rows - 1)
+        last_row = np.clip(bottom[visible] // self.tile, 0, self._rows - 1)
+
+        # Boxes no larger than a tile touch at most two tiles per axis; larger
+        # ones are rare (overlays, text) and are filled in one by one
+        small = ((last_col - first_col) <= 1) & ((last_row - first_row) <= 1)
+        for column in (first_col[small], last_col[small]):
+            for row in (first_row[small], last_row[small]):
+                self._current[column, row] = True
+        for c0, c1, r0, r1 in zip(first_col[~small].tolist(), last_col[~small].tolist(),
+                                  first_row[~small].tolist(), last_row[~small].tolist()):
+            self._current[c0:c1 + 1, r0:r1 + 1] = True
+
+    def _rects(self, dirty):
+        """Merge each row of dirty tiles into horizontal runs"""
+        rects = []
+        for row in range(self._rows):
+            columns = np.flatnonzero(dirty[:, row])
+            if len(columns) == 0:
+                continue
+            breaks = np.flatnonzero(np.diff(columns) > 1)
+            starts = np.concatenate(([columns[0]], columns[breaks + 1]))
+            ends = np.concatenate((columns[breaks], [columns[-1]]))
+            for start, end in zip(starts.tolist(), ends.tolist()):
+                rects.append(pygame.Rect(start * self.tile, row * self.tile,
+                                         (end - start + 1) * self.tile, self.tile))
+        return rects
+
+    def present(self):
+        dirty = self._current | self._previous
+        if self._full or np.count_nonzero(dirty) > self.max_area * dirty.size:
+            pygame.display.flip()
+            self.full_flips += 1
+        else:
+            rects = self._rects(dirty)
+            if rects:
+                pygame.display.update(rects)
+            self.partial_updates += 1
+
+        self._previous, self._current = self._current, self._previous
+        self._current[:] = False
+        self._full = False
@@ -7,21 +7,52 @@ from constants import *
 import pygame
 import random
 import math
+from itertools import repeat
 from constants import *
+from layout import machine_layout
+from sprite_cache import SpriteCache
+from text_cache import TextCache
 
 
 class EndSequenceManager:
-    def __init__(self, screen, font, big_font):
+    # Phase lengths in frames: replication holds for 3 seconds after full
+    # coverage, and alignment is extended for the full sequence
+    REPLICATION_HOLD_FRAMES = 180
+    ALIGNMENT_FRAMES = ALIGNMENT_TEXT_DELAY + FINAL_TEXT_DELAY + 360
+
+    # Everything besides caches that a snapshot() has to carry
+    SNAPSHOT_FIELDS = ("timer", "phase", "active_machines", "max_machines", "replication_complete",
+                       "survival_timer", "replication_timer", "layout_seed", "machine_count")
+
+    def __init__(self, screen, font, big_font, text_cache=None, sprites=None, rng=None,
+                 layout_seed=None, machine_count=MACHINE_COUNT, max_machines=MAX_MACHINES):
         self.screen = screen
         self.font = font
         self.big_font = big_font
+        self.text_cache = text_cache if text_cache is not None else TextCache()
+        self.sprites = sprites if sprites is not None else SpriteCache()
+        self.rng = rng if rng is not None else random.Random()
         self.timer = 0
         self.phase = 0
-        self.machine_positions = []
+        self.machine_positions = ()
+        self.machine_dests = []
+
+        # The machine layout is kept across resets until the seed, machine
+        # count or screen size change
+        self.layout_seed = layout_seed if layout_seed is not None else self.rng.randrange(2 ** 32)
+        self.machine_count = machine_count
+
+        # Fully faded-in machines are painted once onto this layer, in index
+        # order; the first `machine_layer_count` machines are on it
+        self.machine_layer = pygame.Surface(screen.get_size(), 0, screen)
+        self.machine_layer.set_colorkey(WHITE)
+        self.machine_layer_count = 0
+        self.machine_layer_rect = pygame.Rect(0, 0, 0, 0)
+
         self.active_machines = 0
-        self.max_machines = 600  # Increased for more coverage
+        self.max_machines = max_machines
         self.replication_complete = False
-        self._generate_machine_positions()
+        self._update_machine_positions()
         self.survival_timer = 0
         self.replication_timer = 0
 
@@ -36,31 +67,135 @@ class EndSequenceManager:
         elif stage == END_STATE:
             self._draw_end_phase()
 
-    def _generate_machine_positions(self):
-        """Generate random positions for machine replications"""
-        self.machine_positions = []
-        margin = 20  # Reduced margin for more coverage
-        rows = 30  # Increased grid density
-        cols = 30  # Increased grid density
-        spacing_x = (WIDTH - 2 * margin) / cols
-        spacing_y = (HEIGHT - 2 * margin) / rows
-
-        # Generate grid-based positions with random offsets
-        for i in range(rows * cols):
-            row = i // cols
-            col = i % cols
-            x = margin + col * spacing_x + random.randint(-5, 5)
-            y = margin + row * spacing_y + random.randint(-5, 5)
-            self.machine_positions.append((int(x), int(y)))
-
-        # Add some completely random positions for more organic feel
-        for _ in range(100):  # Additional random positions
-            x = random.randint(margin, WIDTH - margin)
-            y = random.randint(margin, HEIGHT - margin)
-            self.machine_positions.append((int(x), int(y)))
-
-        # Shuffle positions for more random appearance
-        random.shuffle(self.machine_positions)
+    def update(self, stage):
+        """Advance the phase timers by one frame; called before draw()"""
+        if stage == MACHINE_REPLICATION:
+            # Calculate how many machines should be active based on timer
+            self.timer += 1
+            if self.timer % 8 == 0:  # Fast replication
+                self.active_machines = self._replicated(self.active_machines)
+        elif stage == AI_ALIGNMENT:
+            self.replication_timer += 1
+
+    def _replicated(self, active_machines):
+        """Active machine count after one round of replication"""
+        if active_machines == 0:
+            return 10  # Start with 2 machines
+        return min(int(active_machines * 1.4) + 2, self.max_machines)
+
+    def skip(self, stage, frames):
+        """Same as `frames` rounds of check_phase_complete() and update() in which the phase does not complete"""
+        if stage == MACHINE_SURVIVAL:
+            self.survival_timer += frames
+        elif stage == MACHINE_REPLICATION:
+            self.replication_timer += frames
+            for _ in range((self.timer + frames) // 8 - self.timer // 8):
+                self.active_machines = self._replicated(self.active_machines)
+            self.timer += frames
+        elif stage == AI_ALIGNMENT:
+            self.replication_timer += frames
+
+    def frames_until_complete(self, stage):
+        """How many more frames' check_phase_complete() calls it takes for the phase to complete.
+
+        None for stages that do not complete by themselves.
+        """
+        if stage == MACHINE_SURVIVAL:
+            return max(1, SURVIVAL_TEXT_DELAY - self.survival_timer)
+        elif stage == MACHINE_REPLICATION:
+            # The check comes before each frame's update(), so it only sees
+            # the machines replicated up to the previous frame
+            timer, active_machines, frames = self.timer, self.active_machines, 1
+            while active_machines < self.max_machines - 5:
+                wait = 8 - timer % 8
+                timer += wait
+                frames += wait
+                active_machines = self._replicated(active_machines)
+            return max(frames, self.REPLICATION_HOLD_FRAMES - self.replication_timer)
+        elif stage == AI_ALIGNMENT:
+            return max(1, self.ALIGNMENT_FRAMES - self.replication_timer + 1)
+        return None
+
+    def _update_machine_positions(self):
+        """Fetch the Poisson-disc machine layout, keeping the machine layer if it is unchanged"""
+        positions = machine_layout(self.layout_seed, self.machine_count, *self.screen.get_size())
+        if positions is self.machine_positions:
+            return
+        self.machine_positions = positions
+
+        # Top-left corners for blitting the machine sprites
+        self.machine_dests = [(x - SMALL_RADIUS - 1, y - SMALL_RADIUS - 1)
+                              for x, y in self.machine_positions]
+        self._reset_machine_layer()
+
+    def _machine_sprite(self, alpha):
+        # Alpha is truncated to an int, as pygame does with color tuples
+        return self.sprites.translucent_circle(BLUE, SMALL_RADIUS, int(alpha))
+
+    def _reset_machine_layer(self):
+        self._set_machine_layer_alpha(None)
+        self.machine_layer.fill(WHITE)
+        self.machine_layer_count = 0
+        self.machine_layer_rect = pygame.Rect(0, 0, 0, 0)
+
+    def _commit_machines(self, count):
+        """Paint machines up to index `count` onto the machine layer at full opacity"""
+        if count <= self.machine_layer_count:
+            return
+
+        self._set_machine_layer_alpha(None)
+        rects = self.machine_layer.blits(
+            zip(repeat(self._machine_sprite(255)), self.machine_dests[self.machine_layer_count:count]))
+        if self.machine_layer_rect:
+            rects.append(self.machine_layer_rect)
+        self.machine_layer_rect = rects[0].unionall(rects[1:])
+        self.machine_layer_count = count
+
+    def _set_machine_layer_alpha(self, alpha):
+        # RLE lets the faded whole-field blit skip the empty runs, but SDL
+        # re-encodes it whenever the alpha changes and decodes it on every
+        # blit into the layer, so the opaque layer that is still being
+        # painted goes without. pygame only toggles RLE through set_alpha.
+        # SDL decodes the layer by blitting it onto itself with whatever alpha
+        # is set at the time, which is only lossless at full opacity: a fully
+        # opaque layer stays unencoded, and dropping RLE passes through 255
+        if alpha == 255:
+            alpha = None
+        current = self.machine_layer.get_alpha()
+        if alpha == current:
+            return
+        if alpha is None:
+            self.machine_layer.set_alpha(255, pygame.RLEACCEL)
+        self.machine_layer.set_alpha(alpha, pygame.RLEACCEL if alpha is not None else 0)
+
+    def _blit_machine_layer(self, alpha=None):
+        self._set_machine_layer_alpha(alpha)
+        self.screen.blit(self.machine_layer, self.machine_layer_rect, self.machine_layer_rect)
+
+    def _draw_replication_machines(self):
+        """Draw the active machines, fading each one in after the timer passes 2 * i"""
+        visible = max(0, min(self.active_machines, (self.timer + 1) // 2))
+        opaque = max(0, min(visible, (self.timer - 17) // 2 + 1))
+
+        # Machines that finished fading in only ever get painted once; a
+        # restarted replication starts over from an empty layer
+        if opaque < self.machine_layer_count:
+            self._reset_machine_layer()
+        self._commit_machines(opaque)
+        if self.machine_layer_count:
+            self._blit_machine_layer()
+
+        fading = [min(255, (self.timer - (i * 2)) * 15)  # Fast fade-in
+                  for i in range(self.machine_layer_count, visible)]
+        self.screen.blits([(self._machine_sprite(alpha), dest)
+                           for dest, alpha in zip(self.machine_dests[self.machine_layer_count:], fading)],
+                          doreturn=False)
+
+    def _draw_machine_field(self, alpha):
+        """Draw every machine faded by one global alpha, reusing the machine layer"""
+        if int(alpha) > 0:
+            self._commit_machines(len(self.machine_dests))
+            self._blit_machine_layer(int(alpha))
 
     def _draw_survival_phase(self, business_pos, workers_pos):
         # Draw just the two main circles connected by a clean line
@@ -69,7 +204,7 @@ class EndSequenceManager:
         pygame.draw.circle(self.screen, BLUE, workers_pos, SMALL_RADIUS)
 
         # Draw machine survival text
-        text_surface = self.font.render("Machine Survival", True, BLACK)
+        text_surface = self.text_cache.render(self.font, "Machine Survival", BLACK)
         text_rect = text_surface.get_rect(center=(business_pos[0], business_pos[1] + 40))
         self.screen.blit(text_surface, text_rect)
         #
@@ -85,66 +220,46 @@ class EndSequenceManager:
         pygame.draw.circle(self.screen, BLUE, workers_pos, SMALL_RADIUS)
         # pygame.draw.line(self.screen, BLUE, business_pos, workers_pos, 2)
 
-        # Calculate how many machines should be active based on timer
-        self.timer += 1
-        if self.timer % 8 == 0:  # Fast replication
-            if self.active_machines == 0:
-                self.active_machines = 10  # Start with 2 machines
-            else:
-                new_machines = min(int(self.active_machines * 1.4) + 2, self.max_machines)
-                self.active_machines = new_machines
-
         # Draw active machines with fade-in effect
-        for i in range(self.active_machines):
-            alpha = min(255, (self.timer - (i * 2)) * 15)  # Fast fade-in
-            if alpha > 0:
-                pos = self.machine_positions[i]
-                circle_surface = pygame.Surface((SMALL_RADIUS * 2 + 2, SMALL_RADIUS * 2 + 2), pygame.SRCALPHA)
-                pygame.draw.circle(circle_surface, (*BLUE[:3], alpha),
-                                   (SMALL_RADIUS + 1, SMALL_RADIUS + 1), SMALL_RADIUS)
-                self.screen.blit(circle_surface,
-                                 (pos[0] - SMALL_RADIUS - 1, pos[1] - SMALL_RADIUS - 1))
+        self._draw_replication_machines()
 
         # Draw texts
-        text_surface = self.font.render("Machine Survival", True, BLACK)
+        text_surface = self.text_cache.render(self.font, "Machine Survival", BLACK)
         text_rect = text_surface.get_rect(center=(business_pos[0], business_pos[1] + 40))
         self.screen.blit(text_surface, text_rect)
 
         machine_text = "Machine Replication"
-        text_surface = self.font.render(machine_text, True, BLACK)
+        text_surface = self.text_cache.render(self.font, machine_text, BLACK)
         text_rect = text_surface.get_rect(center=(workers_pos[0], workers_pos[1] + 40))
         self.screen.blit(text_surface, text_rect)
 
 
     def _draw_alignment_phase(self):
+        # update() has already counted this frame
+        alignment_frame = self.replication_timer - 1
+
         # Calculate fade out effect for machines
         machine_alpha = 255
         text_alpha = 0
 
-        if self.replication_timer >= 120:  # After 2 seconds of full coverage
-            fade_progress = min(60, self.replication_timer - 120)
+        if alignment_frame >= 120:  # After 2 seconds of full coverage
+            fade_progress = min(60, alignment_frame - 120)
             machine_alpha = max(0, 255 - (fade_progress * 4.25))
             text_alpha = min(255, fade_progress * 4.25)
 
         # Draw machines with fade out
         if machine_alpha > 0:
-            for pos in self.machine_positions:
-                circle_surface = pygame.Surface((SMALL_RADIUS * 2 + 2, SMALL_RADIUS * 2 + 2), pygame.SRCALPHA)
-                pygame.draw.circle(circle_surface, (*BLUE[:3], machine_alpha),
-                                   (SMALL_RADIUS + 1, SMALL_RADIUS + 1), SMALL_RADIUS)
-                self.screen.blit(circle_surface,
-                                 (pos[0] - SMALL_RADIUS - 1, pos[1] - SMALL_RADIUS - 1))
+            self._draw_machine_field(machine_alpha)
 
         # Only start drawing text after machines start fading
         if text_alpha > 0:
-            subtitle_timer = self.replication_timer - 180  # Start subtitle timer after fade
+            subtitle_timer = alignment_frame - 180  # Start subtitle timer after fade
 
             if subtitle_timer > 0 and subtitle_timer <= 360:  # First 4 seconds
                 # First subtitle
                 subtitle1 = "The only winning move is not to play"
-                sub1_surface = self.big_font.render(subtitle1, True, BLACK)
                 sub1_alpha = min(255, subtitle_timer * 8)
-                sub1_surface.set_alpha(sub1_alpha)
+                sub1_surface = self.text_cache.render_faded(self.big_font, subtitle1, BLACK, sub1_alpha)
                 sub1_rect = sub1_surface.get_rect(center=(WIDTH // 2, HEIGHT // 2 - 80))
                 self.screen.blit(sub1_surface, sub1_rect)
 
@@ -153,47 +268,36 @@ class EndSequenceManager:
 
                 # Header text
                 header = "Shared Responsibility"
-                header_surface = self.big_font.render(header, True, BLACK)
-                header_surface.set_alpha(fade_in)
+                header_surface = self.text_cache.render_faded(self.big_font, header, BLACK, fade_in)
                 header_rect = header_surface.get_rect(center=(WIDTH // 2, HEIGHT // 2 - 150))
                 self.screen.blit(header_surface, header_rect)
 
                 # AI Alignment text
                 align_text = "AI Alignment"
-                align_surface = self.font.render(align_text, True, BLACK)
-                align_surface.set_alpha(fade_in)
+                align_surface = self.text_cache.render_faded(self.font, align_text, BLACK, fade_in)
 
                 align_rect = align_surface.get_rect(center=(WIDTH // 2, HEIGHT // 2 - 80 ))
                 self.screen.blit(align_surface, align_rect)
 
                 # No Kill Switch
                 planning_text = "No Kill Switch as 95% of labour"
-                planning_surface = self.font.render(planning_text, True, BLACK)
-                planning_surface.set_alpha(fade_in)
+                planning_surface = self.text_cache.render_faded(self.font, planning_text, BLACK, fade_in)
                 planning_rect = planning_surface.get_rect(center=(WIDTH // 2, HEIGHT // 2 - 30))
                 self.screen.blit(planning_surface, planning_rect)
 
                 # Planning text
                 planning_text = "Planning for Social Change"
-                planning_surface = self.font.render(planning_text, True, BLACK)
-                planning_surface.set_alpha(fade_in)
+                planning_surface = self.text_cache.render_faded(self.font, planning_text, BLACK, fade_in)
                 planning_rect = planning_surface.get_rect(center=(WIDTH // 2, HEIGHT // 2 + 30))
                 self.screen.blit(planning_surface, planning_rect)
 
-        self.replication_timer += 1
-
     def _draw_end_phase(self):
         # Draw background machines faded
-        for pos in self.machine_positions:
-            circle_surface = pygame.Surface((SMALL_RADIUS * 2 + 2, SMALL_RADIUS * 2 + 2), pygame.SRCALPHA)
-            pygame.draw.circle(circle_surface, (*BLUE[:3], 30),
-                               (SMALL_RADIUS + 1, SMALL_RADIUS + 1), SMALL_RADIUS)
-            self.screen.blit(circle_surface,
-                             (pos[0] - SMALL_RADIUS - 1, pos[1] - SMALL_RADIUS - 1))
+        self._draw_machine_field(30)
 
         # Main title
         title = "THE END"
-        title_surface = self.big_font.render(title, True, BLACK)
+        title_surface = self.text_cache.render(self.big_font, title, BLACK)
         title_rect = title_surface.get_rect(center=(WIDTH // 2, HEIGHT // 2))
         self.screen.blit(title_surface, title_rect)
 
@@ -205,10 +309,11 @@ class EndSequenceManager:
         elif stage == MACHINE_REPLICATION:
             self.replication_timer += 1
             if self.active_machines >= self.max_machines - 5:
-                return self.replication_timer >= 180  # 3 seconds after full coverage
+                return self.replication_timer >= self.REPLICATION_HOLD_FRAMES
             return False
         elif stage == AI_ALIGNMENT:
-            return self.timer >= ALIGNMENT_TEXT_DELAY + FINAL_TEXT_DELAY + 360  # Extended for full sequence
+            # The alignment phase counts its frames in replication_timer
+            return self.replication_timer >= self.ALIGNMENT_FRAMES
         return False
 
     def reset_timer(self):
@@ -218,4 +323,15 @@ class EndSequenceManager:
         self.replication_timer = 0
         self.active_machines = 0
         self.replication_complete = False
-        self._generate_machine_positions()
\ No newline at end of file
+        self._update_machine_positions()
+
+    def snapshot(self) -> dict:
+        """Timers and layout parameters, enough to resume the sequence elsewhere"""
+        return {name: getattr(self, name) for name in self.SNAPSHOT_FIELDS}
+
+    def restore(self, state: dict):
+        """Continue from a snapshot(); the machine layer is repainted on demand"""
+        for name in self.SNAPSHOT_FIELDS:
+            setattr(self, name, state[name])
+        self._update_machine_positions()
+        self._reset_machine_layer()
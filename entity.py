@@ -1,23 +1,25 @@
 # entity.py
 import pygame
 from constants import *
+from text_cache import TextCache
 
 
 class Entity:
-    def __init__(self, screen, font, small_font):
+    def __init__(self, screen, font, small_font, text_cache=None):
         self.screen = screen
         self.font = font
         self.small_font = small_font
+        self.text_cache = text_cache if text_cache is not None else TextCache()
 
     def draw_circle(self, pos, color, main_text, sub_text="", radius=30):
         pygame.draw.circle(self.screen, color, pos, radius)
 
-        text_surface = self.font.render(main_text, True, BLACK)
+        text_surface = self.text_cache.render(self.font, main_text, BLACK)
         text_rect = text_surface.get_rect(center=(pos[0], pos[1] + radius + 10))
         self.screen.blit(text_surface, text_rect)
 
         if sub_text:
-            sub_surface = self.small_font.render(sub_text, True, BLACK)
+            sub_surface = self.text_cache.render(self.small_font, sub_text, BLACK)
             sub_rect = sub_surface.get_rect(center=(pos[0], pos[1] + radius + 30))
             self.screen.blit(sub_surface, sub_rect)
 
@@ -35,11 +37,11 @@ class Entity:
                          (x + 15 * scale, y - 10 * scale),
                          max(1, int(3 * scale)))
 
-        text_surface = self.font.render("Humans", True, BLACK)
+        text_surface = self.text_cache.render(self.font, "Humans", BLACK)
         text_rect = text_surface.get_rect(center=(x, y + radius + 10))
         self.screen.blit(text_surface, text_rect)
 
-        sub_surface = self.small_font.render("Poolside", True, BLACK)
+        sub_surface = self.text_cache.render(self.small_font, "Poolside", BLACK)
         sub_rect = sub_surface.get_rect(center=(x, y + radius + 30))
         self.screen.blit(sub_surface, sub_rect)
 
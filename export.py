@@ -0,0 +1,176 @@
+# export.py
+import os
+import struct
+import threading
+import zlib
+from multiprocessing import Pool
+
+import pygame
+from constants import *
+from simulation import EconomySimulation
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return (struct.pack(">I", len(data)) + kind + data +
+            struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+
+def encode_png(width: int, height: int, rgb: bytes, compression: int = EXPORT_COMPRESSION) -> bytes:
+    """Encode tightly packed 8-bit RGB rows as a PNG image"""
+    stride = width * 3
+    # Every scanline starts with its filter type; 0 stores the row unfiltered
+    scanlines = b"".join(b"\x00" + rgb[row:row + stride] for row in range(0, height * stride, stride))
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (PNG_SIGNATURE + _png_chunk(b"IHDR", header) +
+            _png_chunk(b"IDAT", zlib.compress(scanlines, compression)) + _png_chunk(b"IEND", b""))
+
+
+def _write_png(path, width, height, rgb, compression):
+    """Worker task: encode one frame and write it to disk"""
+    with open(path, "wb") as file:
+        file.write(encode_png(width, height, rgb, compression))
+    return path
+
+
+class FrameExporter:
+    """Writes frames as a numbered PNG sequence, encoded in a process pool.
+
+    submit() copies the frame's pixels and returns at once; encoding and
+    writing happen in the workers. At most `max_pending` frames are in flight,
+    so memory stays bounded: when that many are queued, submit() waits for
+    the oldest to finish instead of growing the queue.
+    """
+
+    def __init__(self, directory: str, workers: int = None, max_pending: int = EXPORT_MAX_PENDING,
+                 compression: int = EXPORT_COMPRESSION, pattern: str = "frame_{:05d}.png"):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.pattern = pattern
+        self.compression = compression
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self._pool = Pool(self.workers)
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._error = None
+
+        # Export counters
+        self.submitted = 0
+        self.written = 0
+        self.waits = 0
+
+    def _finished(self, path):
+        self.written += 1
+        self._slots.release()
+
+    def _failed(self, error):
+        if self._error is None:
+            self._error = error
+        self._slots.release()
+
+    def submit(self, surface):
+        """Queue the surface's current contents as the next frame of the sequence"""
+        if self._error is not None:
+            raise self._error
+        if not self._slots.acquire(blocking=False):
+            self.waits += 1
+            self._slots.acquire()
+
+        width, height = surface.get_size()
+        path = os.path.join(self.directory, self.pattern.format(self.submitted))
+        self._pool.apply_async(_write_png,
+                               (path, width, height, pygame.image.tostring(surface, "RGB"), self.compression),
+                               callback=self._finished, error_callback=self._failed)
+        self.submitted += 1
+
+    def close(self):
+        """Wait for every queued frame to be written"""
+        self._pool.close()
+        self._pool.join()
+        if self._error is not None:
+            raise self._error
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "submitted": self.submitted,
+            "written": self.written,
+            "waits": self.waits,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if exc_info[0] is None:
+            self.close()
+        else:
+            self._pool.terminate()
+
+
+# Each segment worker process keeps one simulation and reuses it for every
+# segment it renders
+_segment_simulation = None
+
+
+def _start_segment_worker(seed, max_particles):
+    global _segment_simulation
+    # SDL turns SIGTERM into a quit event, which would keep the pool from
+    # terminating its workers
+    os.environ["SDL_NO_SIGNAL_HANDLERS"] = "1"
+    _segment_simulation = EconomySimulation(headless=True, seed=seed, max_particles=max_particles)
+
+
+def _render_segment(task):
+    """Worker task: render and encode the frames from a snapshot up to `stop`"""
+    snapshot, stop, stage_frames, end_frames, directory, pattern, compression = task
+    simulation = _segment_simulation
+    simulation.restore(snapshot)
+    width, height = simulation.screen.get_size()
+
+    def write(screen):
+        path = os.path.join(directory, pattern.format(simulation.frame_count - 1))
+        _write_png(path, width, height, pygame.image.tostring(screen, "RGB"), compression)
+
+    simulation.run_timeline(stage_frames, end_frames, stop, write)
+    return snapshot["frame_count"], simulation.frame_count
+
+
+def export_segments(directory: str, seed: int, workers: int = None,
+                    segment_frames: int = EXPORT_SEGMENT_FRAMES,
+                    stage_frames: int = TIMELINE_STAGE_FRAMES, end_frames: int = TIMELINE_END_FRAMES,
+                    max_frames: int = None, compression: int = EXPORT_COMPRESSION,
+                    pattern: str = "frame_{:05d}.png", on_segment=None,
+                    max_particles: int = MAX_PARTICLES):
+    """Render the scripted timeline to a numbered PNG sequence in parallel.
+
+    A pass without drawing snapshots the simulation every `segment_frames`
+    frames. Each worker process restores a snapshot into its own headless
+    simulation and renders and encodes that segment, so the segments are
+    independent and the frames come out identical to a sequential run.
+    `on_segment(start, stop)` is called for each finished segment, in
+    timeline order. Returns the number of frames written.
+    """
+    os.makedirs(directory, exist_ok=True)
+    planner = EconomySimulation(headless=True, seed=seed, max_particles=max_particles)
+    snapshots, frames = planner.plan_timeline(stage_frames, end_frames, max_frames, segment_frames)
+    # Workers start their own pygame; none is left running in this process to fork
+    pygame.quit()
+    if frames == 0:
+        return 0
+
+    stops = [snapshot["frame_count"] for snapshot in snapshots[1:]] + [frames]
+    tasks = [(snapshot, stop, stage_frames, end_frames, directory, pattern, compression)
+             for snapshot, stop in zip(snapshots, stops)]
+    workers = workers or os.cpu_count() or 1
+    pool = Pool(min(workers, len(tasks)), _start_segment_worker, (seed, max_particles))
+    try:
+        for start, stop in pool.imap(_render_segment, tasks):
+            if on_segment is not None:
+                on_segment(start, stop)
+    except BaseException:
+        pool.terminate()
+        raise
+    pool.close()
+    pool.join()
+    return frames
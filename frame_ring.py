@@ -0,0 +1,243 @@
+# frame_ring.py
+"""Shared-memory ring buffer of rendered frames.
+
+One writer (the simulation) publishes frames into a memory-mapped file and
+one reader in any local process consumes them straight out of the mapping,
+without copying or pickling. Put the file on a RAM-backed filesystem such
+as /dev/shm to keep it off the disk.
+
+Layout: a 64-byte header, then `slots` slots of a 64-byte slot header and
+one frame each. Frames are stored as rows of pixels in the screen's own
+format, so publishing one is a single copy out of the surface.
+
+    header  magic, version, width, height, bytes per pixel, slots,
+            R/G/B byte offsets, then the written, released, dropped and read counters
+    slot    sequence number + 1 of the frame it holds (0 while being written),
+            then height * width * bytes_per_pixel bytes of pixels
+"""
+import mmap
+import struct
+import sys
+import time
+
+import numpy as np
+from constants import FRAME_RING_SLOTS, FRAME_RING_POLL
+
+MAGIC = b"EFVRING\x00"
+VERSION = 2
+OVERWRITE = "overwrite"
+BLOCK = "block"
+POLICIES = (OVERWRITE, BLOCK)
+
+_LAYOUT = struct.Struct("<8sIIIIIBBB")
+_COUNTER = struct.Struct("<Q")
+_WRITTEN, _RELEASED, _DROPPED, _READ = 32, 40, 48, 56
+_HEADER_SIZE = 64
+_SLOT_HEADER_SIZE = 64
+
+
+def _slot_stride(frame_size):
+    # Slots start on 64-byte boundaries
+    return _SLOT_HEADER_SIZE + -(-frame_size // 64) * 64
+
+
+class _FrameRing:
+    """Memory-mapped file access shared by the writer and the reader"""
+
+    def _map(self, file, size):
+        self._file = file
+        self._mmap = mmap.mmap(file.fileno(), size)
+        self.frame_size = self.height * self.width * self.bytes_per_pixel
+        self._stride = _slot_stride(self.frame_size)
+
+        # One numpy view per slot; readers get these directly
+        self._frames = [np.frombuffer(self._mmap, np.uint8, self.frame_size,
+                                      _HEADER_SIZE + slot * self._stride + _SLOT_HEADER_SIZE)
+                        .reshape(self.height, self.width, self.bytes_per_pixel)
+                        for slot in range(self.slots)]
+
+    def _get(self, offset):
+        return _COUNTER.unpack_from(self._mmap, offset)[0]
+
+    def _set(self, offset, value):
+        _COUNTER.pack_into(self._mmap, offset, value)
+
+    def _slot_sequence(self, slot):
+        return self._get(_HEADER_SIZE + slot * self._stride)
+
+    def _set_slot_sequence(self, slot, value):
+        self._set(_HEADER_SIZE + slot * self._stride, value)
+
+    @property
+    def written(self) -> int:
+        """Frames published so far; the next frame gets this sequence number"""
+        return self._get(_WRITTEN)
+
+    @property
+    def released(self) -> int:
+        """Frames the reader has finished with"""
+        return self._get(_RELEASED)
+
+    @property
+    def frames_read(self) -> int:
+        """Frames the reader has read or skipped; the next one it reads has this sequence number"""
+        return self._get(_READ)
+
+    @property
+    def dropped(self) -> int:
+        """Frames the reader never got: overwritten unread, or skipped by a blocked writer"""
+        return self._get(_DROPPED)
+
+    def rgb(self, frame):
+        """View of a frame's red, green and blue channels, without copying when the layout allows"""
+        offsets = list(self.channel_offsets)
+        step = offsets[1] - offsets[0]
+        if step != 0 and offsets[2] - offsets[1] == step:
+            stop = offsets[2] + step
+            return frame[..., offsets[0]:stop if stop >= 0 else None:step]
+        return frame[..., offsets]
+
+    def close(self):
+        # Views into the mapping have to go before it can be closed
+        self._frames = []
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class FrameRingWriter(_FrameRing):
+    """Publishes frames into a new ring buffer file at `path`.
+
+    When the reader falls `slots` frames behind, the `overwrite` policy
+    replaces the oldest unread frame and `block` waits up to `timeout`
+    seconds (None waits forever) for the reader to release one, dropping
+    the new frame if it does not. Either way `dropped` counts the loss.
+    Under overwrite a frame counts as lost only if it was never read;
+    under block the writer waits for release(), not just read().
+    """
+
+    def __init__(self, path: str, width: int, height: int, bytes_per_pixel: int = 4,
+                 channel_offsets=(2, 1, 0), slots: int = FRAME_RING_SLOTS,
+                 policy: str = OVERWRITE, timeout: float = None):
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {POLICIES}, not {policy!r}")
+        self.path = path
+        self.width = width
+        self.height = height
+        self.bytes_per_pixel = bytes_per_pixel
+        self.channel_offsets = tuple(channel_offsets)
+        self.slots = slots
+        self.policy = policy
+        self.timeout = timeout
+
+        size = _HEADER_SIZE + slots * _slot_stride(width * height * bytes_per_pixel)
+        file = open(path, "w+b")
+        file.truncate(size)
+        self._map(file, size)
+        _LAYOUT.pack_into(self._mmap, 0, MAGIC, VERSION, width, height, bytes_per_pixel, slots,
+                          *self.channel_offsets)
+
+    @classmethod
+    def for_surface(cls, path: str, surface, **options):
+        """A ring whose frames match the surface's size and pixel format"""
+        width, height = surface.get_size()
+        bytes_per_pixel = surface.get_bytesize()
+        shifts = surface.get_shifts()[:3]
+        if sys.byteorder == "little":
+            offsets = [shift // 8 for shift in shifts]
+        else:
+            offsets = [bytes_per_pixel - 1 - shift // 8 for shift in shifts]
+        return cls(path, width, height, bytes_per_pixel, offsets, **options)
+
+    def _wait_for_slot(self, frame):
+        deadline = None if self.timeout is None else time.perf_counter() + self.timeout
+        while frame - self.released >= self.slots:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return False
+            time.sleep(FRAME_RING_POLL)
+        return True
+
+    def write(self, surface) -> bool:
+        """Publish the surface's pixels as the next frame; False if the frame was dropped"""
+        frame = self.written
+        if self.policy == BLOCK:
+            if frame - self.released >= self.slots and not self._wait_for_slot(frame):
+                self._set(_DROPPED, self.dropped + 1)
+                return False
+        elif frame - self.frames_read >= self.slots:
+            # The frame in this slot is replaced before the reader got to it
+            self._set(_DROPPED, self.dropped + 1)
+
+        # The slot's sequence is cleared while its pixels are replaced, so a
+        # reader can tell a torn frame from a complete one
+        slot = frame % self.slots
+        self._set_slot_sequence(slot, 0)
+        pitch = surface.get_pitch()
+        row_bytes = self.width * self.bytes_per_pixel
+        pixels = np.frombuffer(surface.get_view("0"), np.uint8).reshape(self.height, pitch)
+        self._frames[slot].reshape(self.height, row_bytes)[:] = pixels[:, :row_bytes]
+        del pixels
+        self._set_slot_sequence(slot, frame + 1)
+        self._set(_WRITTEN, frame + 1)
+        return True
+
+
+class FrameRingReader(_FrameRing):
+    """Consumes frames from the ring buffer file a FrameRingWriter created.
+
+    read() hands out a view straight into the shared mapping and tells the
+    writer how far the reader got, which is all the overwrite policy needs.
+    A blocking writer reuses a slot only once release() hands it back, so
+    under that policy call release() when done with each frame. Under the
+    overwrite policy, check is_current() after using the view to be sure the
+    writer did not replace it meanwhile.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        file = open(path, "r+b")
+        header = file.read(_LAYOUT.size)
+        magic, version, self.width, self.height, self.bytes_per_pixel, self.slots, *offsets = \
+            _LAYOUT.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} frame ring")
+        self.channel_offsets = tuple(offsets)
+        self._map(file, _HEADER_SIZE + self.slots * _slot_stride(
+            self.width * self.height * self.bytes_per_pixel))
+
+        # Start at the oldest frame still in the ring
+        self.position = max(self.frames_read, self.written - self.slots)
+
+    def read(self, timeout: float = None):
+        """Wait up to `timeout` seconds for the next frame; returns (sequence, pixels) or None.
+
+        Frames the writer overwrote before they were read are skipped.
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            written = self.written
+            self.position = max(self.position, written - self.slots)
+            if self.position < written:
+                slot = self.position % self.slots
+                if self._slot_sequence(slot) == self.position + 1:
+                    self.position += 1
+                    self._set(_READ, self.position)
+                    return self.position - 1, self._frames[slot]
+                # Being overwritten right now; the writer is a lap ahead
+                continue
+            if deadline is not None and time.perf_counter() >= deadline:
+                return None
+            time.sleep(FRAME_RING_POLL)
+
+    def is_current(self, sequence: int) -> bool:
+        """Whether the frame read as `sequence` is still intact in its slot"""
+        return self._slot_sequence(sequence % self.slots) == sequence + 1
+
+    def release(self):
+        """Hand every frame read so far back to the writer"""
+        self._set(_RELEASED, self.position)
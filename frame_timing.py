@@ -0,0 +1,141 @@
+# frame_timing.py
+"""Per-frame timing of the main loop's sections.
+
+The loop calls mark(section) at each section boundary, and the time since
+the previous mark is added to that section of the current frame. A section
+may be marked several times a frame, such as once per simulation step.
+Frames are kept in a fixed-size ring buffer, so recording never allocates.
+While disabled, mark() and end_frame() return at once. With a `trace`
+attached, every section and frame is also recorded as a trace span.
+"""
+import time
+
+import numpy as np
+import pygame
+from constants import BLACK, FRAME_TIMING_FRAMES, FRAME_TIMING_HUD_REFRESH
+
+# Sections of a frame, in loop order
+EVENTS = 0
+TRANSITIONS = 1
+PARTICLES = 2
+SPAWN = 3
+DRAW = 4
+PRESENT = 5
+WAIT = 6
+OUTPUT = 7
+SECTION_NAMES = ("events", "transitions", "particles", "spawn", "draw", "present", "wait", "output")
+
+
+class FrameTimer:
+    """Ring buffer of the nanoseconds each frame spent in each section"""
+
+    def __init__(self, frames: int = FRAME_TIMING_FRAMES, enabled: bool = False):
+        self.samples = np.zeros((frames, len(SECTION_NAMES)), dtype=np.int64)
+        self.frames = 0
+        # The frame being recorded; a list is cheaper to add to than an array row
+        self._current = [0] * len(SECTION_NAMES)
+        self._last = None
+        self._frame_start = None
+        self._enabled = enabled
+
+        # Optional frame_trace.TraceWriter receiving a span per section and frame
+        self.trace = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, enabled: bool):
+        if enabled != self._enabled:
+            # The first frame after enabling starts at its first mark
+            self._last = None
+        self._enabled = enabled
+
+    def mark(self, section: int):
+        """Add the time since the previous mark to `section` of the current frame"""
+        if not self._enabled:
+            return
+        now = time.perf_counter_ns()
+        if self._last is None:
+            self._frame_start = now
+        else:
+            self._current[section] += now - self._last
+            if self.trace is not None:
+                self.trace.span(SECTION_NAMES[section], self._last, now)
+        self._last = now
+
+    def end_frame(self):
+        """Close the current frame and start recording the next one"""
+        if not self._enabled:
+            return
+        if self.trace is not None and self._frame_start is not None:
+            self.trace.span("frame", self._frame_start, self._last, {"frame": self.frames})
+        self._frame_start = self._last
+        self.samples[self.frames % len(self.samples)] = self._current
+        self.frames += 1
+        self._current = [0] * len(SECTION_NAMES)
+
+    def recent(self) -> np.ndarray:
+        """Nanoseconds per section of the finished frames still in the buffer, oldest first"""
+        count = min(self.frames, len(self.samples))
+        start = self.frames - count
+        rows = [(start + i) % len(self.samples) for i in range(count)]
+        return self.samples[rows]
+
+    def averages(self) -> dict:
+        """Mean milliseconds per section over the buffered frames"""
+        recent = self.recent()
+        if len(recent) == 0:
+            return {name: 0.0 for name in SECTION_NAMES}
+        means = recent.mean(axis=0) / 1e6
+        return dict(zip(SECTION_NAMES, means.tolist()))
+
+    def worst(self) -> float:
+        """Longest buffered frame in milliseconds"""
+        recent = self.recent()
+        return float(recent.sum(axis=1).max()) / 1e6 if len(recent) else 0.0
+
+    def clear(self):
+        self.samples[:] = 0
+        self.frames = 0
+        self._current = [0] * len(SECTION_NAMES)
+        self._last = None
+
+
+class TimingHud:
+    """Overlay with the frame timer's rolling averages, worst frame and particle counts.
+
+    The text is re-rendered every `refresh` frames rather than every frame,
+    which keeps it readable and cheap.
+    """
+
+    def __init__(self, font, refresh: int = FRAME_TIMING_HUD_REFRESH):
+        self.font = font
+        self.refresh = refresh
+        self.surface = None
+        self._age = 0
+
+    def _lines(self, timer, particle_counts):
+        averages = timer.averages()
+        total = sum(averages.values())
+        lines = [f"frame {total:6.2f} ms avg  {timer.worst():6.2f} ms worst  "
+                 f"({min(timer.frames, len(timer.samples))} frames)"]
+        lines += [f"{name:>11} {ms:6.2f} ms" for name, ms in averages.items()]
+        lines.append("particles " + "  ".join(f"{kind} {count}" for kind, count in particle_counts.items()))
+        return lines
+
+    def draw(self, screen, timer, particle_counts):
+        """Blit the overlay at the top left; returns the rect it covers"""
+        if self.surface is None or self._age >= self.refresh:
+            rendered = [self.font.render(line, True, BLACK) for line in self._lines(timer, particle_counts)]
+            line_height = self.font.get_linesize()
+            width = max(surface.get_width() for surface in rendered) + 8
+            self.surface = pygame.Surface((width, line_height * len(rendered) + 8), 0, screen)
+            self.surface.fill((235, 235, 235))
+            self.surface.set_alpha(220)
+            for i, surface in enumerate(rendered):
+                self.surface.blit(surface, (4, 4 + i * line_height))
+            self._age = 0
+        self._age += 1
+        return screen.blit(self.surface, (10, 10))
@@ -0,0 +1,91 @@
+# frame_trace.py
+"""Chrome trace-event export of the main loop, for chrome://tracing or ui.perfetto.dev.
+
+Spans (complete events) and instant events are collected in memory and
+handed over in batches to a writer thread. It formats them and streams them
+into a JSON array, so a session of any length can be traced without
+the frame loop ever waiting on the disk.
+"""
+import json
+import queue
+import threading
+import time
+
+from constants import TRACE_FLUSH_EVENTS
+
+_PID = 1
+_TID = 1
+
+
+class TraceWriter:
+    """Streams trace events to `path`; call close() to finish the file"""
+
+    def __init__(self, path: str, flush_events: int = TRACE_FLUSH_EVENTS):
+        self.path = path
+        self.flush_events = flush_events
+        self.events = 0
+        self._origin = time.perf_counter_ns()
+        self._pending = []
+        self._batches = queue.Queue()
+
+        self._file = open(path, "w")
+        self._file.write("[\n")
+        self._writer = threading.Thread(target=self._write_batches, name="trace writer", daemon=True)
+        self._writer.start()
+
+    def span(self, name: str, start_ns: int, end_ns: int, args: dict = None):
+        """Record a span between two perf_counter_ns() readings"""
+        self._pending.append(("X", name, start_ns, end_ns, args))
+        if len(self._pending) >= self.flush_events:
+            self.flush()
+
+    def instant(self, name: str, args: dict = None):
+        """Record an event at the current moment, drawn as a marker across the timeline"""
+        self._pending.append(("i", name, time.perf_counter_ns(), None, args))
+        if len(self._pending) >= self.flush_events:
+            self.flush()
+
+    def flush(self):
+        """Hand the collected events to the writer thread"""
+        if self._pending:
+            self.events += len(self._pending)
+            self._batches.put(self._pending)
+            self._pending = []
+
+    def _format(self, event):
+        phase, name, start, end, args = event
+        fields = {"name": name, "ph": phase, "ts": (start - self._origin) / 1000, "pid": _PID, "tid": _TID}
+        if phase == "X":
+            fields["dur"] = (end - start) / 1000
+        else:
+            fields["s"] = "g"
+        if args:
+            fields["args"] = args
+        return json.dumps(fields)
+
+    def _write_batches(self):
+        while True:
+            batch = self._batches.get()
+            if batch is None:
+                return
+            self._file.write("".join(self._format(event) + ",\n" for event in batch))
+
+    def close(self):
+        """Write out everything recorded and close the file"""
+        self.flush()
+        self._batches.put(None)
+        self._writer.join()
+
+        # Metadata last, so the array ends without a trailing comma
+        names = [("process_name", "Economic Flow Visualization"), ("thread_name", "main loop")]
+        self._file.write(",\n".join(json.dumps({"name": kind, "ph": "M", "pid": _PID, "tid": _TID,
+                                                "args": {"name": name}})
+                                    for kind, name in names))
+        self._file.write("\n]\n")
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
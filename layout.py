@@ -0,0 +1,120 @@
+# layout.py
+import math
+from functools import lru_cache
+
+import numpy as np
+
+# Offsets of the 5x5 block of grid cells that can hold a point within one radius
+_NEIGHBOURS_X, _NEIGHBOURS_Y = (offsets.ravel() for offsets in np.mgrid[-2:3, -2:3])
+
+# Points a maximal Poisson-disc set of radius r packs into an area A is about
+# _PACKING * A / r ** 2; used to pick the radius for a requested point count
+_PACKING = 0.62
+
+
+def poisson_disc(width: float, height: float, radius: float, rng, attempts: int = 30):
+    """Bridson's Poisson-disc sampling of [0, width) x [0, height).
+
+    No two points are closer than `radius`, and no gap is large enough to fit
+    another. A background grid with cells of radius / sqrt(2) holds at most one
+    point each, so every candidate is checked against 25 cells only. Each round
+    draws `attempts` candidates around every active point at once; a point
+    leaves the active list once none of its candidates fit.
+    Returns an (n, 2) float array of points.
+    """
+    cell = radius / math.sqrt(2)
+    columns = int(math.ceil(width / cell))
+    rows = int(math.ceil(height / cell))
+    min_distance_sq = radius * radius
+
+    # Padded by two cells on every side so neighbour lookups never go out of
+    # bounds; empty cells hold -1, which reads the unused last point slot
+    grid = np.full((columns + 4, rows + 4), -1, dtype=np.int64)
+    points_x = np.zeros(columns * rows + 1)
+    points_y = np.zeros(columns * rows + 1)
+
+    def cells(x, y):
+        return (x / cell).astype(np.int64) + 2, (y / cell).astype(np.int64) + 2
+
+    def conflicts(x, y, ignore_from=None):
+        """Which of the points (x, y) are within one radius of a point on the grid"""
+        cx, cy = cells(x, y)
+        neighbours = grid[cx[:, None] + _NEIGHBOURS_X, cy[:, None] + _NEIGHBOURS_Y]
+        close = (neighbours >= 0) & ((points_x[neighbours] - x[:, None]) ** 2 +
+                                     (points_y[neighbours] - y[:, None]) ** 2 < min_distance_sq)
+        if ignore_from is not None:
+            close &= neighbours < ignore_from[:, None]
+        return close.any(axis=1)
+
+    def place(x, y, first):
+        new = np.arange(first, first + len(x))
+        points_x[new] = x
+        points_y[new] = y
+        grid[cells(x, y)] = new
+        return new
+
+    place(np.array([rng.uniform(0, width)]), np.array([rng.uniform(0, height)]), 0)
+    count = 1
+    active = np.zeros(1, dtype=np.int64)
+
+    while len(active):
+        # Candidates in the annulus [r, 2r) around every active point
+        owner = np.repeat(active, attempts)
+        angle = rng.uniform(0, 2 * math.pi, len(owner))
+        distance = rng.uniform(radius, 2 * radius, len(owner))
+        x = points_x[owner] + distance * np.cos(angle)
+        y = points_y[owner] + distance * np.sin(angle)
+        inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        x, y, owner = x[inside], y[inside], owner[inside]
+
+        # A taken cell is always too close, and ruling those out first spares
+        # most candidates the full neighbourhood check once the area fills up
+        empty = grid[cells(x, y)] < 0
+        x, y, owner = x[empty], y[empty], owner[empty]
+        free = ~conflicts(x, y)
+        x, y, owner = x[free], y[free], owner[free]
+
+        # Candidates of the same round can be too close to each other: keep
+        # one per grid cell, in random order, then drop any that are too close
+        # to one placed before them. The rest of the space is filled later on
+        order = rng.permutation(len(x))
+        x, y = x[order], y[order]
+        cx, cy = cells(x, y)
+        _, first = np.unique(cx * grid.shape[1] + cy, return_index=True)
+        first.sort()
+        x, y = x[first], y[first]
+        rejected = conflicts(x, y, ignore_from=place(x, y, count))
+        grid[cells(x[rejected], y[rejected])] = -1
+
+        new = place(x[~rejected], y[~rejected], count)
+        count += len(new)
+
+        # Points with no candidate that fit have no room left around them
+        active = np.concatenate((np.intersect1d(active, owner), new))
+
+    return np.column_stack((points_x[:count], points_y[:count]))
+
+
+@lru_cache(maxsize=8)
+def machine_layout(seed: int, count: int, width: int, height: int, margin: int = 20):
+    """`count` evenly spread integer points inside the margins, in random order.
+
+    Layouts are cached by their arguments, so asking again for the same
+    (seed, count, resolution) returns the same tuple without resampling.
+    """
+    rng = np.random.default_rng(seed)
+    area_width = width - 2 * margin
+    area_height = height - 2 * margin
+
+    # Aim a little above `count` and tighten the radius until enough points fit
+    radius = math.sqrt(_PACKING * area_width * area_height / (count * 1.05))
+    points = poisson_disc(area_width, area_height, radius, rng)
+    while len(points) < count:
+        radius *= 0.95
+        points = poisson_disc(area_width, area_height, radius, rng)
+
+    # A random subset of a Poisson-disc set is still evenly spread, and the
+    # order is the order machines appear in during replication
+    points = points[rng.permutation(len(points))[:count]]
+    return tuple(zip((points[:, 0] + margin).astype(int).tolist(),
+                     (points[:, 1] + margin).astype(int).tolist()))
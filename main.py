@@ -1,5 +1,172 @@
+import argparse
+import json
+import random
+import time
+
+import pygame
+from constants import *
+from export import FrameExporter, export_segments
+from frame_ring import FrameRingWriter, POLICIES, OVERWRITE
 from simulation import EconomySimulation
+from stage_profile import SAMPLER_AVAILABLE
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Economic Flow Visualization")
+    parser.add_argument("--headless", action="store_true",
+                        help="run offscreen without a window or frame cap, playing the whole timeline")
+    parser.add_argument("--export", metavar="DIR",
+                        help="render the timeline headless and write every frame to DIR as a numbered PNG")
+    parser.add_argument("--export-workers", type=int, default=None,
+                        help="processes rendering and encoding segments (default: the CPU count)")
+    parser.add_argument("--segment-frames", type=int, default=EXPORT_SEGMENT_FRAMES,
+                        help="frames per independently rendered segment of an export")
+    parser.add_argument("--frame-ring", metavar="PATH",
+                        help="publish every frame to a shared-memory ring buffer file, e.g. /dev/shm/efv-frames")
+    parser.add_argument("--frame-ring-slots", type=int, default=FRAME_RING_SLOTS,
+                        help="frames the ring buffer holds")
+    parser.add_argument("--frame-ring-policy", choices=POLICIES, default=OVERWRITE,
+                        help="when the reader falls behind, overwrite its oldest frame or block until it catches up")
+    parser.add_argument("--stage-frames", type=int, default=TIMELINE_STAGE_FRAMES,
+                        help="frames each stage is shown before a headless run advances it")
+    parser.add_argument("--end-frames", type=int, default=TIMELINE_END_FRAMES,
+                        help="frames of the end state a headless run shows before stopping")
+    parser.add_argument("--max-frames", type=int, default=None,
+                        help="stop a headless run after this many frames")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed for every randomized path; the same seed and input reproduce a run exactly")
+    parser.add_argument("--max-particles", type=int, default=MAX_PARTICLES,
+                        help="live particle cap; spawns beyond it are dropped. Past "
+                             f"{SPLAT_THRESHOLD} live particles they are drawn with the surfarray splatter")
+    parser.add_argument("--render-fps", type=int, default=RENDER_FPS,
+                        help="cap on rendered frames per second in interactive runs, 0 for none; "
+                             f"the simulation always steps at {FPS} per second")
+    parser.add_argument("--timing-hud", action="store_true",
+                        help="start with the frame timing HUD shown (toggle with F3)")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="write a Chrome trace-event timeline of every frame to FILE, "
+                             "for chrome://tracing or ui.perfetto.dev")
+    parser.add_argument("--profile-stage", choices=list(STAGE_NAMES),
+                        help="profile the functions run during this stage, writing "
+                             "profile-<stage>-seed<seed>.pstats (F4 profiles the current stage)")
+    parser.add_argument("--profile-dir", default=".",
+                        help="directory stage profiles are written to")
+    parser.add_argument("--profile-sampler", action="store_true",
+                        help="profile with a low-overhead stack sampler instead of cProfile, "
+                             "writing collapsed stacks (.folded) for flame graphs")
+    parser.add_argument("--allocations", metavar="FILE",
+                        help="trace memory allocations with tracemalloc and write bytes and blocks per frame "
+                             "by subsystem and stage, top allocation sites and peak RSS to FILE as JSON")
+    parser.add_argument("--dirty-rects", action="store_true",
+                        help="present only the changed screen areas")
+    args = parser.parse_args()
+    if args.profile_sampler and not SAMPLER_AVAILABLE:
+        parser.error("--profile-sampler needs interval timers, which this platform lacks")
+    return args
+
+
+def frame_sinks(callbacks):
+    """One on_frame callback that calls each of the given ones"""
+    callbacks = [callback for callback in callbacks if callback is not None]
+    if not callbacks:
+        return None
+
+    def on_frame(screen):
+        for callback in callbacks:
+            callback(screen)
+    return on_frame
+
+
+def run_timeline(simulation, args, on_frame=None):
+    start = time.perf_counter()
+    frames = simulation.run_timeline(args.stage_frames, args.end_frames, args.max_frames, on_frame)
+    pygame.quit()
+    elapsed = time.perf_counter() - start
+    print(f"{frames} frames in {elapsed:.2f} s ({frames / elapsed:.0f} fps, "
+          f"{frames / FPS / elapsed:.1f}x real time, seed {simulation.seed})")
+    pool = simulation.particle_system.stats()
+    print(f"particle pool: {pool['hits']} hits, {pool['misses']} misses, {pool['dropped']} dropped "
+          f"(capacity {pool['capacity']} of {pool['max_particles']})")
+    timer = simulation.frame_timer
+    if timer.enabled:
+        print(f"mean ms over the last {len(timer.recent())} frames: " + ", ".join(
+            f"{section} {ms:.3f}" for section, ms in timer.averages().items()))
+
+
+def print_allocations(report):
+    stages = report["stages"]
+    subsystems = list(next(iter(stages.values()))["subsystems"]) if stages else []
+    print(f"{'KiB per frame, mean / max':<26}" + "".join(f"{subsystem:>20}" for subsystem in subsystems))
+    for stage, allocations in stages.items():
+        cells = "".join(f"{used['mean_bytes'] / 1024:>11.1f} /{used['max_bytes'] / 1024:>7.1f}"
+                        for used in allocations["subsystems"].values())
+        print(f"{stage:<26}{cells}")
+    print(f"peak traced {report['peak_traced'] / 2 ** 20:.1f} MiB", end="")
+    if report["peak_rss"] is not None:
+        print(f", peak RSS {report['peak_rss'] / 2 ** 20:.1f} MiB", end="")
+    print()
+
+
+def export(args):
+    # Segments render out of order in other processes, each from a snapshot
+    seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+    start = time.perf_counter()
+    frames = export_segments(args.export, seed, args.export_workers, args.segment_frames,
+                             args.stage_frames, args.end_frames, args.max_frames,
+                             on_segment=lambda first, stop: print(f"frames {first}-{stop - 1} written"),
+                             max_particles=args.max_particles)
+    elapsed = time.perf_counter() - start
+    print(f"wrote {frames} frames to {args.export} in {elapsed:.2f} s "
+          f"({frames / elapsed:.0f} fps, seed {seed})")
+
 
 if __name__ == "__main__":
-    simulation = EconomySimulation()
-    simulation.run()
\ No newline at end of file
+    args = parse_args()
+    # The frame ring, the trace, the profiler and the allocation tracker need
+    # every frame from this process, in order
+    in_process = (args.frame_ring, args.trace, args.profile_stage, args.allocations)
+    if args.export is not None and all(option is None for option in in_process):
+        export(args)
+        raise SystemExit
+
+    headless = args.headless or args.export is not None
+    simulation = EconomySimulation(dirty_rects=args.dirty_rects, headless=headless, seed=args.seed,
+                                   render_fps=args.render_fps, timing_hud=args.timing_hud,
+                                   max_particles=args.max_particles)
+
+    if args.trace is not None:
+        simulation.start_trace(args.trace)
+    if args.profile_stage is not None:
+        simulation.profile_stage(args.profile_stage, args.profile_dir, args.profile_sampler)
+    if args.allocations is not None:
+        simulation.start_allocation_tracking()
+
+    ring = None
+    if args.frame_ring is not None:
+        ring = FrameRingWriter.for_surface(args.frame_ring, simulation.screen,
+                                           slots=args.frame_ring_slots, policy=args.frame_ring_policy)
+
+    if args.export is not None:
+        # Only the encoding runs in parallel
+        with FrameExporter(args.export, args.export_workers) as exporter:
+            run_timeline(simulation, args, frame_sinks([exporter.submit, ring.write if ring else None]))
+        print(f"wrote {exporter.written} frames to {args.export} "
+              f"({exporter.workers} workers, {exporter.waits} waits on a full queue)")
+    elif headless:
+        run_timeline(simulation, args, frame_sinks([ring.write if ring else None]))
+    else:
+        simulation.run(frame_sinks([ring.write if ring else None]))
+
+    if ring is not None:
+        print(f"published {ring.written} frames to {args.frame_ring}, {ring.dropped} dropped")
+        ring.close()
+    if args.trace is not None:
+        print(f"wrote {simulation.stop_trace()} trace events to {args.trace}")
+    for path in simulation.stop_profile():
+        print(f"wrote profile {path}")
+    if args.allocations is not None:
+        report = simulation.stop_allocation_tracking()
+        with open(args.allocations, "w") as file:
+            json.dump(report, file, indent=2)
+        print_allocations(report)
+        print(f"wrote allocation report to {args.allocations}")
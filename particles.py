@@ -1,43 +1,311 @@
 # particles.py
 import math
+import numpy as np
 import pygame
-from constants import DARK_RED, PURPLE  # Import needed color constants
-
-class Particle:
-    def __init__(self, x: float, y: float, target_x: float, target_y: float, color, speed: float = 3):
-        self.x = x
-        self.y = y
-        self.target_x = target_x
-        self.target_y = target_y
-        self.color = color
-        self.speed = speed
-        self.size = 5
-        self.alive = True
-
-    def update(self):
-        dx = self.target_x - self.x
-        dy = self.target_y - self.y
+from constants import DARK_RED, PURPLE, MAX_PARTICLES, SPLAT_THRESHOLD  # Import needed color constants
+from sprite_cache import SpriteCache
+
+# Particle kinds, in the order they are drawn
+FLOW_KIND = 0
+UNREST_KIND = 1
+ATTACK_KIND = 2
+PARTICLE_KINDS = (FLOW_KIND, UNREST_KIND, ATTACK_KIND)
+
+
+class ParticleSystem:
+    """Struct-of-arrays particle store that advances every particle in one vectorized step.
+
+    Particles move in a straight line at constant speed, so each one only
+    stores where and when it started, its per-tick velocity and the tick it
+    arrives on. Positions are a pure function of the tick.
+    """
+
+    FIELDS = ("start_x", "start_y", "vel_x", "vel_y", "spawn_tick", "arrival_tick",
+              "size", "color", "kind", "alive")
+
+    def __init__(self, capacity: int = 256, max_particles: int = MAX_PARTICLES, sprites=None,
+                 splat_threshold: int = SPLAT_THRESHOLD):
+        self.count = 0
+        self.killed = 0  # Slots below count killed since the last compact()
+        self.tick = 0
+        self.max_particles = max_particles
+        self.splat_threshold = splat_threshold
+        self.sprites = sprites if sprites is not None else SpriteCache()
+        self._allocate(min(capacity, max_particles))
+
+        # Pool statistics: spawns served from an existing slot, spawns that had
+        # to grow the arrays, and spawns refused because the cap was reached
+        self.hits = 0
+        self.misses = 0
+        self.dropped = 0
+
+    def _allocate(self, capacity):
+        """(Re)allocate the backing arrays, keeping the first `count` entries"""
+        old = getattr(self, "start_x", None)
+        fields = {
+            "start_x": np.zeros(capacity, dtype=np.float64),
+            "start_y": np.zeros(capacity, dtype=np.float64),
+            "vel_x": np.zeros(capacity, dtype=np.float64),
+            "vel_y": np.zeros(capacity, dtype=np.float64),
+            "spawn_tick": np.zeros(capacity, dtype=np.int64),
+            "arrival_tick": np.zeros(capacity, dtype=np.int64),
+            "size": np.zeros(capacity, dtype=np.int32),
+            "color": np.zeros((capacity, 3), dtype=np.uint8),
+            "kind": np.zeros(capacity, dtype=np.int8),
+            "alive": np.zeros(capacity, dtype=bool),
+        }
+        for name, array in fields.items():
+            if old is not None:
+                array[:self.count] = getattr(self, name)[:self.count]
+            setattr(self, name, array)
+        self.capacity = capacity
+
+    def __len__(self):
+        """Number of live particles; killed ones stop counting before they are compacted"""
+        return self.count - self.killed
+
+    def spawn(self, x: float, y: float, target_x: float, target_y: float, color,
+              speed: float = 3, size: int = 5, kind: int = FLOW_KIND) -> bool:
+        """Add a particle, returning False if the population cap dropped it"""
+        if self.count == self.capacity:
+            if self.capacity >= self.max_particles:
+                self.dropped += 1
+                return False
+            self._allocate(min(max(1, self.capacity * 2), self.max_particles))
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        dx = target_x - x
+        dy = target_y - y
         distance = math.sqrt(dx ** 2 + dy ** 2)
+        scale = speed / distance if distance else 0.0
 
-        if distance < self.speed:
-            self.alive = False
+        # A particle makes floor(distance / speed) full steps; the update after
+        # that finds it closer than one step to its target and retires it
+        i = self.count
+        self.start_x[i] = x
+        self.start_y[i] = y
+        self.vel_x[i] = dx * scale
+        self.vel_y[i] = dy * scale
+        self.spawn_tick[i] = self.tick
+        self.arrival_tick[i] = self.tick + int(distance // speed) + 1
+        self.size[i] = size
+        self.color[i] = color
+        self.kind[i] = kind
+        self.alive[i] = True
+        self.count += 1
+        return True
+
+    def spawn_unrest(self, x: float, y: float, target_x: float, target_y: float) -> bool:
+        """Dark red, 7 px particle moving at 4 px per tick"""
+        return self.spawn(x, y, target_x, target_y, DARK_RED, speed=4, size=7, kind=UNREST_KIND)
+
+    def spawn_machine_attack(self, x: float, y: float, target_x: float, target_y: float) -> bool:
+        """Purple, 8 px particle moving at 5 px per tick"""
+        return self.spawn(x, y, target_x, target_y, PURPLE, speed=5, size=8, kind=ATTACK_KIND)
+
+    def __iter__(self):
+        """Iterate over the indices of live particles; kill() is safe while iterating"""
+        return iter(np.flatnonzero(self.alive[:self.count]).tolist())
+
+    def kill(self, index: int):
+        """Mark a particle dead in O(1); its slot is reclaimed by the next compact()"""
+        if self.alive[index]:
+            self.alive[index] = False
+            self.killed += 1
+
+    def positions_at(self, tick):
+        """Positions of the stored particles at any tick, without touching state"""
+        n = self.count
+        elapsed = tick - self.spawn_tick[:n]
+        return (self.start_x[:n] + self.vel_x[:n] * elapsed,
+                self.start_y[:n] + self.vel_y[:n] * elapsed)
+
+    def boxes(self, tick=None):
+        """Screen boxes (left, top, width, height arrays) covered by the live particles at `tick`"""
+        live = self.alive[:self.count]
+        x, y = self.positions_at(self.tick if tick is None else tick)
+        x, y = x[live], y[live]
+        size = self.size[:self.count][live]
+        extent = size * 2 + 2
+        return x.astype(np.int32) - size - 1, y.astype(np.int32) - size - 1, extent, extent
+
+    def update(self, ticks=1):
+        """Advance `ticks` ticks at once and drop the particles that have arrived.
+
+        Arrivals are dropped in tick order, only on the ticks that have any,
+        which leaves the survivors in the same slots as single-tick updates.
+        """
+        first = self.tick + 1
+        self.tick += ticks
+        n = self.count
+        if n == 0:
             return
 
-        dx = dx / distance * self.speed
-        dy = dy / distance * self.speed
+        arrivals = self.arrival_tick[:n]
+        due = np.unique(arrivals[(arrivals > first) & (arrivals <= self.tick)]).tolist()
+        for tick in [first] + due:
+            n = self.count
+            self.alive[:n] &= self.arrival_tick[:n] > tick
+            self.compact()
+
+    def compact(self):
+        """Fill the holes left by dead particles with live ones from the tail.
+
+        Only the dead slots below the new count are written, so the cost is
+        proportional to the number of deaths rather than the population.
+        """
+        n = self.count
+        live = int(np.count_nonzero(self.alive[:n]))
+        self.killed = 0
+        if live == n:
+            return
+
+        holes = np.flatnonzero(~self.alive[:live])
+        movers = np.flatnonzero(self.alive[live:n]) + live
+        if len(holes):
+            for name in self.FIELDS:
+                array = getattr(self, name)
+                array[holes] = array[movers]
+        self.count = live
+
+    def count_kind(self, kind: int) -> int:
+        n = self.count
+        return int(np.count_nonzero((self.kind[:n] == kind) & self.alive[:n]))
+
+    def draw(self, screen, tick=None):
+        """Draw every live particle, splatting into the pixel array once there are many.
+
+        With a `tick`, which may fall between two updates, particles are drawn
+        where they are at that moment, leaving out those spawned since.
+        """
+        live = len(self)
+        if live == 0:
+            return
+        if live >= self.splat_threshold:
+            self.draw_splat(screen, tick)
+        else:
+            self.draw_blits(screen, tick)
+
+    def _styles(self, tick=None):
+        """Live particles in draw order, grouped by their distinct (color, size) style.
+
+        Returns the draw order, the integer positions in that order, each
+        particle's style index and the list of (color, size) styles.
+        """
+        n = self.count
+        if tick is None:
+            tick = self.tick
+            members = np.flatnonzero(self.alive[:n])
+        else:
+            members = np.flatnonzero(self.alive[:n] & (self.spawn_tick[:n] < tick))
+
+        # Draw kind by kind, as the separate particle lists used to
+        order = members[np.argsort(self.kind[members], kind="stable")]
+        x, y = self.positions_at(tick)
+        size = self.size[order]
+        color = self.color[order].astype(np.int64)
+
+        style = (color[:, 0] << 32) | (color[:, 1] << 24) | (color[:, 2] << 16) | size
+        keys, style_index = np.unique(style, return_inverse=True)
+        styles = [(((key >> 32) & 0xFF, (key >> 24) & 0xFF, (key >> 16) & 0xFF), key & 0xFFFF)
+                  for key in keys.tolist()]
+        return order, x[order].astype(np.int32), y[order].astype(np.int32), style_index, styles
+
+    def draw_blits(self, screen, tick=None):
+        """Stamp every live particle with a cached sprite in a single blits call"""
+        order, x, y, style_index, styles = self._styles(tick)
+        stamps = [self.sprites.circle(color, size) for color, size in styles]
+
+        offset = self.size[order] + 1
+        left = (x - offset).tolist()
+        top = (y - offset).tolist()
+
+        # Feed blits lazily: a materialized list of 100k (sprite, pos) tuples
+        # costs more in allocation and GC than the blitting itself
+        screen.blits(zip(map(stamps.__getitem__, style_index.tolist()), zip(left, top)),
+                     doreturn=False)
+
+    def draw_splat(self, screen, tick=None):
+        """Rasterize every live particle straight into the screen's pixel array.
+
+        Particles are marked at their centers in a grid holding each style's
+        paint rank, which is then dilated by the disc mask with one shifted
+        maximum per disc pixel. The cost depends on the screen size and the
+        number of distinct sizes, not on the particle count. Higher-ranked
+        styles win overlaps, so particles of different colors within one kind
+        may overlap differently than with blits.
+        """
+        order, x, y, style_index, styles = self._styles(tick)
+        if len(order) == 0:
+            return
+        width, height = screen.get_size()
+        pad = int(self.size[:self.count].max()) + 1
+
+        # Rank styles by the draw order of their first particle; 0 means empty
+        used, first_seen = np.unique(style_index, return_index=True)
+        rank = np.zeros(len(styles), dtype=np.uint8)
+        rank[used[np.argsort(first_seen)]] = np.arange(1, len(used) + 1)
+        particle_rank = rank[style_index]
+        palette = np.zeros(len(used) + 1, dtype=np.uint32)
+        for style in used.tolist():
+            palette[rank[style]] = screen.map_rgb(styles[style][0])
+
+        cx = x + pad
+        cy = y + pad
+        inside = (cx >= 0) & (cx < width + 2 * pad) & (cy >= 0) & (cy < height + 2 * pad)
+        sizes = np.array([styles[style][1] for style in range(len(styles))])[style_index]
+
+        painted = np.zeros((width, height), dtype=np.uint8)
+        centers = np.zeros((width + 2 * pad, height + 2 * pad), dtype=np.uint8)
+        for size in np.unique(sizes).tolist():
+            members = inside & (sizes == size)
+            centers[:] = 0
+            np.maximum.at(centers, (cx[members], cy[members]), particle_rank[members])
+            for ox, oy in zip(*self.sprites.disc_offsets(size)):
+                np.maximum(painted, centers[pad - ox:pad - ox + width, pad - oy:pad - oy + height],
+                           out=painted)
+
+        pixels = pygame.surfarray.pixels2d(screen)
+        try:
+            covered = painted > 0
+            pixels[covered] = palette[painted[covered]]
+        finally:
+            # Release the surface lock before anything else blits to it
+            del pixels
 
-        self.x += dx
-        self.y += dy
+    def stats(self) -> dict:
+        return {
+            "live": len(self),
+            "capacity": self.capacity,
+            "max_particles": self.max_particles,
+            "hits": self.hits,
+            "misses": self.misses,
+            "dropped": self.dropped,
+        }
 
-    def draw(self, screen):
-        pygame.draw.circle(screen, self.color, (int(self.x), int(self.y)), self.size)
+    def snapshot(self) -> dict:
+        """Copy of the live particles, tick and counters, enough to resume the system elsewhere"""
+        state = {name: getattr(self, name)[:self.count].copy() for name in self.FIELDS}
+        state.update(count=self.count, capacity=self.capacity, tick=self.tick,
+                     hits=self.hits, misses=self.misses, dropped=self.dropped)
+        return state
 
-class UnrestParticle(Particle):
-    def __init__(self, x: float, y: float, target_x: float, target_y: float):
-        super().__init__(x, y, target_x, target_y, DARK_RED, speed=4)
-        self.size = 7
+    def restore(self, state: dict):
+        """Continue from a snapshot() taken from this or another system"""
+        self.count = 0
+        if state["capacity"] != self.capacity:
+            self._allocate(state["capacity"])
+        for name in self.FIELDS:
+            getattr(self, name)[:state["count"]] = state[name]
+        self.count = state["count"]
+        self.killed = self.count - int(np.count_nonzero(self.alive[:self.count]))
+        self.tick = state["tick"]
+        self.hits = state["hits"]
+        self.misses = state["misses"]
+        self.dropped = state["dropped"]
 
-class MachineAttackParticle(Particle):
-    def __init__(self, x: float, y: float, target_x: float, target_y: float):
-        super().__init__(x, y, target_x, target_y, PURPLE, speed=5)
-        self.size = 8
\ No newline at end of file
+    def clear(self):
+        self.count = 0
+        self.killed = 0
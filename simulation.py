@@ -1,20 +1,52 @@
 # simulation.py
+import os
+import time
 import pygame
 from constants import *
-from particles import Particle, UnrestParticle, MachineAttackParticle
+from particles import ParticleSystem
+from sprite_cache import SpriteCache
+from text_cache import TextCache
+from dirty_rects import DirtyRectTracker
 from entity import Entity
 from stage_manager import StageManager
 from ui_manager import UIManager
 from end_sequence import EndSequenceManager
+from frame_timing import (FrameTimer, TimingHud, EVENTS, TRANSITIONS, PARTICLES, SPAWN, DRAW,
+                          PRESENT, WAIT, OUTPUT)
+from frame_trace import TraceWriter
+from stage_profile import StageProfiler
+from allocation_tracking import (AllocationTracker, PARTICLE_ALLOCATIONS, SPAWN_ALLOCATIONS, UI_ALLOCATIONS,
+                                 END_SEQUENCE_ALLOCATIONS)
+from particles import FLOW_KIND, UNREST_KIND, ATTACK_KIND
 import random
 
 
 class EconomySimulation:
-    def __init__(self):
+    def __init__(self, dirty_rects=False, headless=False, seed=None, render_fps=RENDER_FPS,
+                 timing_hud=False, max_particles=MAX_PARTICLES):
+        # Headless runs render offscreen through SDL's dummy video driver and
+        # are not capped to FPS
+        if headless:
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
         pygame.init()
         self.screen = pygame.display.set_mode((WIDTH, HEIGHT))
         pygame.display.set_caption("Economic Flow Visualization")
         self.clock = pygame.time.Clock()
+        self.frame_rate = 0 if headless else FPS
+        self.frame_count = 0
+
+        # Interactive runs render up to render_fps frames a second (0 for no
+        # cap), independently of the fixed simulation rate
+        self.render_fps = render_fps
+        self.render_tick = 0
+
+        # Simulation steps per real-time step in interactive runs, for fast-forwarding
+        self.time_scale = 1
+
+        # Every randomized path draws from this generator, so the same seed and
+        # the same input schedule reproduce a run frame for frame
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
 
         # Initialize fonts
         self.font = pygame.font.Font(None, 36)
@@ -22,16 +54,43 @@ class EconomySimulation:
         self.tiny_font = pygame.font.Font(None, 16)
         self.big_font = pygame.font.Font(None, 48)
 
+        # Pre-rendered sprites and text shared by the renderers
+        self.sprites = SpriteCache()
+        self.text_cache = TextCache()
+
+        # Entities are painted onto a cached layer that is rebuilt only when the
+        # stage, visibility flags or radii change, then blitted every frame
+        self.entity_layer = None
+        self.entity_layer_key = None
+        self.entity_layer_rect = None
+
         # Initialize managers
-        self.entity = Entity(self.screen, self.font, self.small_font)
+        self.entity = Entity(self.screen, self.font, self.small_font, self.text_cache)
         self.stage_manager = StageManager()
-        self.ui_manager = UIManager(self.screen, self.font, self.small_font, self.big_font)
-        self.end_sequence = EndSequenceManager(self.screen, self.font, self.big_font)
-
-        # Lists for particles
-        self.particles = []
-        self.unrest_particles = []
-        self.machine_attack_particles = []
+        self.ui_manager = UIManager(self.screen, self.font, self.small_font, self.big_font, self.text_cache)
+        self.end_sequence = EndSequenceManager(self.screen, self.font, self.big_font,
+                                               self.text_cache, self.sprites, self.rng)
+
+        # Flow, unrest and machine attack particles share one array-backed store,
+        # which switches to splatting past SPLAT_THRESHOLD live particles
+        self.particle_system = ParticleSystem(max_particles=max_particles, sprites=self.sprites)
+
+        # Scripted timeline position: the stage being shown and the frame it began on
+        self.timeline_stage = self.stage_manager.stage
+        self.timeline_stage_start = 0
+
+        # Section timings of every frame, recorded while the HUD (F3) shows
+        # them or a trace is being written
+        self.frame_timer = FrameTimer(enabled=timing_hud)
+        self.timing_hud = TimingHud(self.small_font) if timing_hud else None
+        # Profiles a chosen stage (profile_stage) or, from F4, the current one
+        self.profiler = StageProfiler(None, self.seed)
+        # Allocations per frame by subsystem, recorded after start_allocation_tracking()
+        self.allocations = AllocationTracker()
+
+        # Optional dirty-rect presentation; None means a full flip every frame
+        self.dirty_rects = DirtyRectTracker(WIDTH, HEIGHT) if dirty_rects else None
+        self.dirty_scene = None
 
         # Position constants
         self.rich_pos = (150, 150)
@@ -59,7 +118,7 @@ class EconomySimulation:
         return False
 
     def spawn_particle(self, start_pos, end_pos, color):
-        self.particles.append(Particle(start_pos[0], start_pos[1], end_pos[0], end_pos[1], color))
+        self.particle_system.spawn(start_pos[0], start_pos[1], end_pos[0], end_pos[1], color)
 
     def _spawn_stage_particles(self):
         sm = self.stage_manager
@@ -99,16 +158,17 @@ class EconomySimulation:
         if not self.stage_manager.show_rich:
             return
 
-        offset = random.randint(-20, 20)
-        start_x = self.poolside_pos[0] + random.randint(-30, 30)
-        start_y = self.poolside_pos[1] + random.randint(-30, 30)
+        offset = self.rng.randint(-20, 20)
+        start_x = self.poolside_pos[0] + self.rng.randint(-30, 30)
+        start_y = self.poolside_pos[1] + self.rng.randint(-30, 30)
 
-        self.unrest_particles.append(
-            UnrestParticle(start_x, start_y,
-                           self.rich_pos[0] + offset,
-                           self.rich_pos[1] + offset)
-        )
+        self.particle_system.spawn_unrest(start_x, start_y,
+                                          self.rich_pos[0] + offset,
+                                          self.rich_pos[1] + offset)
         self.stage_manager.handle_rich_attack()
+        if self.stage_manager.rich_attack_count == self.stage_manager.attacks_needed:
+            self._trace_instant("attack threshold", target="rich",
+                                attacks=self.stage_manager.rich_attack_count)
 
     def _spawn_machine_attack(self):
         if not (self.stage_manager.show_govt or self.stage_manager.show_humans):
@@ -119,28 +179,50 @@ class EconomySimulation:
 
         for target_pos, is_visible in targets:
             if is_visible:
-                offset_x = random.randint(-30, 30)
-                offset_y = random.randint(-30, 30)
-                start_x = self.workers_pos[0] + random.randint(-20, 20)
-                start_y = self.workers_pos[1] + random.randint(-20, 20)
+                offset_x = self.rng.randint(-30, 30)
+                offset_y = self.rng.randint(-30, 30)
+                start_x = self.workers_pos[0] + self.rng.randint(-20, 20)
+                start_y = self.workers_pos[1] + self.rng.randint(-20, 20)
 
-                self.machine_attack_particles.append(
-                    MachineAttackParticle(start_x, start_y,
-                                          target_pos[0] + offset_x,
-                                          target_pos[1] + offset_y)
-                )
+                self.particle_system.spawn_machine_attack(start_x, start_y,
+                                                          target_pos[0] + offset_x,
+                                                          target_pos[1] + offset_y)
 
         self.stage_manager.handle_machine_attack()
+        if self.stage_manager.machine_attack_count == self.stage_manager.attacks_needed:
+            self._trace_instant("attack threshold", target="govt and humans",
+                                attacks=self.stage_manager.machine_attack_count)
 
     def draw_credits(self):
         """Draw tiny credits at the bottom of the screen"""
         if self.stage_manager.stage == END_STATE:
             credit_text = "Created with Claude 3.5 Sonnet | WarGames (1983)"
-            credit_surface = self.tiny_font.render(credit_text, True, BLACK)
+            credit_surface = self.text_cache.render(self.tiny_font, credit_text, BLACK)
             credit_rect = credit_surface.get_rect(center=(WIDTH // 2, HEIGHT - 10))
             self.screen.blit(credit_surface, credit_rect)
 
+    def _entity_layer_key(self):
+        sm = self.stage_manager
+        return (sm.stage, sm.show_rich, sm.show_govt, sm.show_humans,
+                sm.rich_radius, sm.human_radius)
+
     def _draw_entities(self):
+        key = self._entity_layer_key()
+        if key != self.entity_layer_key:
+            # A fresh surface each time: painting onto an RLE colorkeyed surface
+            # blends antialiased text differently from painting onto the screen
+            self.entity_layer = pygame.Surface((WIDTH, HEIGHT)).convert()
+            self.entity_layer.fill(WHITE)
+            self.entity.screen = self.entity_layer
+            self._paint_entities()
+            self.entity_layer.set_colorkey(WHITE, pygame.RLEACCEL)
+            self.entity_layer_rect = self.entity_layer.get_bounding_rect()
+            self.entity_layer_key = key
+
+        self.screen.blit(self.entity_layer, self.entity_layer_rect, self.entity_layer_rect)
+
+    def _paint_entities(self):
+        """Draw circles, decorations and captions onto the entity layer"""
         sm = self.stage_manager
         if sm.show_rich:
             self.entity.draw_circle(self.rich_pos, GOLD, "Rich", "Owners/Investors",
@@ -161,15 +243,6 @@ class EconomySimulation:
         if sm.stage != TRADITIONAL and sm.show_humans:
             self.entity.draw_poolside(self.poolside_pos, int(sm.human_radius))
 
-    def handle_particles(self):
-        for particle_list in [self.particles, self.unrest_particles, self.machine_attack_particles]:
-            for particle in particle_list[:]:
-                particle.update()
-                if not particle.alive:
-                    particle_list.remove(particle)
-                else:
-                    particle.draw(self.screen)
-
     def spawn_particles(self, frame_count):
         sm = self.stage_manager
         if frame_count % 30 == 0 and sm.stage not in [AI_ALIGNMENT, END_STATE,
@@ -185,62 +258,410 @@ class EconomySimulation:
     def draw(self):
         sm = self.stage_manager
 
+        allocations = self.allocations
         if sm.stage in [MACHINE_SURVIVAL, MACHINE_REPLICATION]:
+            allocations.begin()
             self.end_sequence.draw(sm.stage, self.business_pos, self.workers_pos)
+            allocations.end(END_SEQUENCE_ALLOCATIONS)
         elif sm.stage in [AI_ALIGNMENT, END_STATE]:
+            allocations.begin()
             self.end_sequence.draw(sm.stage, None, None)
+            allocations.end(END_SEQUENCE_ALLOCATIONS)
         elif sm.stage not in [AI_ALIGNMENT, END_STATE]:
             self._draw_entities()
 
+        allocations.begin()
         self.ui_manager.draw_warning_overlay(sm.stage, sm.warning_alpha)
         self.ui_manager.draw_info(sm.stage)
+        self.ui_manager.draw_time_scale(self.time_scale)
+        allocations.end(UI_ALLOCATIONS)
 
         # Draw credits if in end state
         if sm.stage == END_STATE:
             self.draw_credits()
 
-    def run(self):
-        running = True
-        frame_count = 0
-
-        while running:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_SPACE:
-                        # Only allow space bar control before end sequence
-                        if not self.is_attack_in_progress() and self.stage_manager.stage not in [
-                            MACHINE_SURVIVAL, MACHINE_REPLICATION, AI_ALIGNMENT, END_STATE
-                        ]:
-                            self.stage_manager.advance_stage()  # Use stage manager's advance_stage method
-                            self.end_sequence.reset_timer()
-                            self.particles.clear()
-                            self.unrest_particles.clear()
-                            self.machine_attack_particles.clear()
-
-            self.screen.fill(WHITE)
-
-            # Handle automatic transitions
-            if self.stage_manager.stage == MACHINE_SURVIVAL:
-                if self.end_sequence.check_phase_complete(self.stage_manager.stage):
-                    self.stage_manager.stage = MACHINE_REPLICATION
-                    self.end_sequence.reset_timer()
-            elif self.stage_manager.stage == MACHINE_REPLICATION:
-                if self.end_sequence.check_phase_complete(self.stage_manager.stage):
-                    self.stage_manager.stage = AI_ALIGNMENT
-                    self.end_sequence.reset_timer()
-            elif self.stage_manager.stage == AI_ALIGNMENT:
-                if self.end_sequence.check_phase_complete(self.stage_manager.stage):
-                    self.stage_manager.stage = END_STATE
-                    self.end_sequence.reset_timer()
-
-            self.handle_particles()
-            self.spawn_particles(frame_count)
-            self.draw()
+        self.timing_hud_rect = None
+        if self.timing_hud is not None:
+            self.timing_hud_rect = self.timing_hud.draw(self.screen, self.frame_timer, self.particle_counts())
+
+        if self.dirty_rects is not None:
+            self._mark_dirty_areas()
+
+    def _mark_dirty_areas(self):
+        """Tell the dirty-rect tracker what changed since the previous frame"""
+        sm = self.stage_manager
 
+        # Stage text, entities, captions and the time scale label only change
+        # along with this key; the warning overlay and the replication and
+        # alignment phases animate the whole screen
+        scene = (sm.stage, self.entity_layer_key, self.time_scale)
+        if scene != self.dirty_scene or sm.stage in [UNREST, MACHINE_TAKEOVER,
+                                                     MACHINE_REPLICATION, AI_ALIGNMENT]:
+            self.dirty_rects.invalidate()
+            self.dirty_scene = scene
+
+        self.dirty_rects.mark_boxes(*self.particle_system.boxes(self.render_tick))
+        if self.timing_hud_rect is not None:
+            self.dirty_rects.mark_rect(self.timing_hud_rect)
+
+    def present(self):
+        """Show the finished frame"""
+        if self.dirty_rects is not None:
+            self.dirty_rects.present()
+        else:
             pygame.display.flip()
-            self.clock.tick(FPS)
-            frame_count += 1
 
-        pygame.quit()
\ No newline at end of file
+    def can_advance(self):
+        """Whether the space bar may advance the stage right now"""
+        # Only allow space bar control before end sequence
+        return not self.is_attack_in_progress() and self.stage_manager.stage not in [
+            MACHINE_SURVIVAL, MACHINE_REPLICATION, AI_ALIGNMENT, END_STATE
+        ]
+
+    def advance(self):
+        """Advance to the next stage, as the space bar does"""
+        start = time.perf_counter_ns()
+        previous = self.stage_manager.stage
+        self.stage_manager.advance_stage()  # Use stage manager's advance_stage method
+        self.end_sequence.reset_timer()
+        self.particle_system.clear()
+
+        trace = self.frame_timer.trace
+        if trace is not None:
+            trace.span("advance_stage", start, time.perf_counter_ns(),
+                       {"from": previous, "to": self.stage_manager.stage})
+        self._stage_changed()
+
+    def set_time_scale(self, scale):
+        """Run the interactive simulation `scale` times faster than real time"""
+        if scale <= 0:
+            raise ValueError(f"time scale must be positive, not {scale}")
+        self.time_scale = scale
+
+    def handle_events(self):
+        """Process window events; returns False once the window is closed"""
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return False
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    if self.can_advance():
+                        self.advance()
+                elif pygame.K_1 <= event.key < pygame.K_1 + len(TIME_SCALES):
+                    self.set_time_scale(TIME_SCALES[event.key - pygame.K_1])
+                elif event.key == pygame.K_F3:
+                    self.toggle_timing_hud()
+                elif event.key == pygame.K_F4:
+                    self.toggle_profile()
+        self.frame_timer.mark(EVENTS)
+        return True
+
+    def toggle_timing_hud(self):
+        """Show or hide the frame timing HUD"""
+        if self.timing_hud is None:
+            self.timing_hud = TimingHud(self.small_font)
+            if not self.frame_timer.enabled:
+                self.frame_timer.clear()
+                self.frame_timer.enabled = True
+        else:
+            self.timing_hud = None
+            self.frame_timer.enabled = self.frame_timer.trace is not None
+
+    def start_trace(self, path):
+        """Write a Chrome trace of every frame from now on to `path`, until stop_trace()"""
+        self.stop_trace()
+        self.frame_timer.trace = TraceWriter(path)
+        self.frame_timer.enabled = True
+        self.frame_timer.trace.instant(f"stage {self.stage_manager.stage}", {"frame": self.frame_count})
+
+    def stop_trace(self):
+        """Finish the trace file, if one is being written; returns its event count"""
+        trace = self.frame_timer.trace
+        if trace is None:
+            return 0
+        self.frame_timer.trace = None
+        self.frame_timer.enabled = self.timing_hud is not None
+        trace.close()
+        return trace.events
+
+    def profile_stage(self, stage, directory=".", sampler=False):
+        """Profile every visit to `stage`, writing a file named after it and the seed to `directory`.
+
+        Uses cProfile, or a stack sampler writing collapsed stacks if `sampler`.
+        """
+        self.stop_profile()
+        self.profiler = StageProfiler(stage, self.seed, directory, sampler)
+        self.profiler.stage_changed(self.stage_manager.stage)
+
+    def toggle_profile(self):
+        """Start profiling the current stage until it ends, or stop the running profile"""
+        if self.profiler.running:
+            self.profiler.stop()
+        else:
+            self.profiler.start(self.stage_manager.stage)
+
+    def stop_profile(self) -> list:
+        """Stop a running profile; returns the paths of every profile written"""
+        if self.profiler.running:
+            self.profiler.stop()
+        return self.profiler.paths
+
+    def start_allocation_tracking(self):
+        """Trace allocations with tracemalloc from now on, until stop_allocation_tracking()"""
+        self.allocations.start(self.stage_manager.stage)
+
+    def stop_allocation_tracking(self) -> dict:
+        """Stop tracing allocations; returns the AllocationTracker report"""
+        return self.allocations.stop()
+
+    def _trace_instant(self, name, **args):
+        trace = self.frame_timer.trace
+        if trace is not None:
+            trace.instant(name, dict(args, frame=self.frame_count))
+
+    def particle_counts(self) -> dict:
+        """Live particles of each kind"""
+        counts = self.particle_system.count_kind
+        return {"flow": counts(FLOW_KIND), "unrest": counts(UNREST_KIND), "attack": counts(ATTACK_KIND)}
+
+    def update_transitions(self):
+        """Handle automatic transitions through the end sequence"""
+        if self.stage_manager.stage == MACHINE_SURVIVAL:
+            if self.end_sequence.check_phase_complete(self.stage_manager.stage):
+                self._complete_phase(MACHINE_REPLICATION)
+        elif self.stage_manager.stage == MACHINE_REPLICATION:
+            if self.end_sequence.check_phase_complete(self.stage_manager.stage):
+                self._complete_phase(AI_ALIGNMENT)
+        elif self.stage_manager.stage == AI_ALIGNMENT:
+            if self.end_sequence.check_phase_complete(self.stage_manager.stage):
+                self._complete_phase(END_STATE)
+
+    def _complete_phase(self, next_stage):
+        self._trace_instant("phase complete", stage=self.stage_manager.stage)
+        self.stage_manager.stage = next_stage
+        self.end_sequence.reset_timer()
+        self._stage_changed()
+
+    def _stage_changed(self):
+        stage = self.stage_manager.stage
+        self._trace_instant(f"stage {stage}")
+        self.profiler.stage_changed(stage)
+        self.allocations.stage_changed(stage)
+
+    def update(self, steps=1):
+        """Advance the simulation by `steps` fixed steps of 1 / FPS seconds.
+
+        Runs of steps that spawn nothing and complete no phase only move
+        particles and count timers, so they are advanced in bulk; the steps
+        in between run one at a time. Any number of steps leaves exactly the
+        state that as many single steps would.
+        """
+        while steps > 0:
+            quiet = min(steps, self._quiet_steps())
+            if quiet:
+                self._skip(quiet)
+                steps -= quiet
+            else:
+                self._step_logic()
+                steps -= 1
+
+    def _step_logic(self):
+        timer = self.frame_timer
+        # Pulse the warning overlay while an attack stage is running
+        if self.stage_manager.stage in [UNREST, MACHINE_TAKEOVER]:
+            self.stage_manager.update_warning()
+
+        self.update_transitions()
+        timer.mark(TRANSITIONS)
+        self.allocations.begin()
+        self.particle_system.update()
+        self.allocations.end(PARTICLE_ALLOCATIONS)
+        timer.mark(PARTICLES)
+        self.allocations.begin()
+        self.spawn_particles(self.frame_count)
+        self.allocations.end(SPAWN_ALLOCATIONS)
+        timer.mark(SPAWN)
+        self.end_sequence.update(self.stage_manager.stage)
+        self.frame_count += 1
+        timer.mark(TRANSITIONS)
+
+    def _spawn_periods(self):
+        """Frame intervals at which spawn_particles() may spawn in the current stage"""
+        sm = self.stage_manager
+        periods = []
+        if sm.stage not in [AI_ALIGNMENT, END_STATE, MACHINE_SURVIVAL, MACHINE_REPLICATION]:
+            periods.append(30)
+        if sm.stage == UNREST:
+            periods.append(10)
+        if sm.stage == MACHINE_TAKEOVER:
+            periods.append(5)
+        return periods
+
+    def _quiet_steps(self):
+        """How many of the next steps neither spawn nor complete an end sequence phase"""
+        quiet = float("inf")
+        for period in self._spawn_periods():
+            quiet = min(quiet, -self.frame_count % period)
+
+        until_complete = self.end_sequence.frames_until_complete(self.stage_manager.stage)
+        if until_complete is not None:
+            quiet = min(quiet, until_complete - 1)
+        return quiet
+
+    def _skip(self, steps):
+        """Advance through `steps` quiet steps in one go"""
+        stage = self.stage_manager.stage
+        if stage in [UNREST, MACHINE_TAKEOVER]:
+            self.stage_manager.update_warning(steps)
+
+        self.end_sequence.skip(stage, steps)
+        self.frame_timer.mark(TRANSITIONS)
+        self.allocations.begin()
+        self.particle_system.update(steps)
+        self.allocations.end(PARTICLE_ALLOCATIONS)
+        self.frame_count += steps
+        self.frame_timer.mark(PARTICLES)
+
+    def render(self, alpha=1.0):
+        """Draw and present the state `alpha` of the way from the previous step to the latest.
+
+        Particles are drawn at their interpolated positions; everything else
+        shows the latest step. Drawing never changes the simulation state.
+        """
+        timer = self.frame_timer
+        self.screen.fill(WHITE)
+        self.render_tick = self.particle_system.tick - 1 + alpha
+        timer.mark(DRAW)
+        self.allocations.begin()
+        self.particle_system.draw(self.screen, self.render_tick)
+        self.allocations.end(PARTICLE_ALLOCATIONS)
+        timer.mark(PARTICLES)
+        self.draw()
+        timer.mark(DRAW)
+        self.present()
+        timer.mark(PRESENT)
+
+    def step(self, render=True):
+        """Simulate one step, then draw and present it unless `render` is False.
+
+        Frames that are not rendered leave the state exactly as rendered ones
+        would.
+        """
+        self.update()
+        if render:
+            self.render()
+            self.clock.tick(self.frame_rate)
+            self.frame_timer.mark(WAIT)
+
+    def run(self, on_frame=None):
+        """Interactive main loop; `on_frame(screen)` is called with every rendered frame.
+
+        The simulation steps at a fixed FPS rate against the wall clock, as
+        many times per rendered frame as the elapsed time calls for, so it
+        keeps its pace however fast or slow rendering is. Frames are rendered
+        up to `render_fps` times a second and interpolated between steps.
+        At a time scale above 1 it takes that many times more steps.
+        """
+        step_time = 1 / FPS
+        lag = 0.0
+        previous = time.perf_counter()
+        while self.handle_events():
+            now = time.perf_counter()
+            # After a long stall, skip ahead instead of replaying every step
+            lag += min(now - previous, MAX_FRAME_TIME) * self.time_scale
+            previous = now
+            steps = int(lag / step_time)
+            self.update(steps)
+            lag -= steps * step_time
+
+            self.render(lag / step_time)
+            self.clock.tick(self.render_fps)
+            self.frame_timer.mark(WAIT)
+            if on_frame is not None:
+                on_frame(self.screen)
+                self.frame_timer.mark(OUTPUT)
+            self.frame_timer.end_frame()
+            self.allocations.end_frame()
+
+        pygame.quit()
+
+    def run_timeline(self, stage_frames=TIMELINE_STAGE_FRAMES, end_frames=TIMELINE_END_FRAMES,
+                     max_frames=None, on_frame=None):
+        """Play the whole timeline without input, for headless runs.
+
+        Each stage is advanced as if the space bar were pressed once it has
+        been shown for `stage_frames` frames and an advance is allowed. Stops
+        after `end_frames` frames of the end state, after `max_frames` frames,
+        or when the window is closed. `on_frame(screen)` is called with every
+        finished frame. Returns the number of frames run.
+        """
+        while self.handle_events() and self.follow_timeline(stage_frames, end_frames, max_frames):
+            self.step()
+            if on_frame is not None:
+                on_frame(self.screen)
+                self.frame_timer.mark(OUTPUT)
+            self.frame_timer.end_frame()
+            self.allocations.end_frame()
+
+        return self.frame_count
+
+    def follow_timeline(self, stage_frames, end_frames, max_frames=None):
+        """Scripted input for the next frame of the timeline; False once it is over"""
+        if self.stage_manager.stage != self.timeline_stage:
+            self.timeline_stage = self.stage_manager.stage
+            self.timeline_stage_start = self.frame_count
+        shown = self.frame_count - self.timeline_stage_start
+
+        if self.timeline_stage == END_STATE and shown >= end_frames:
+            return False
+        if max_frames is not None and self.frame_count >= max_frames:
+            return False
+        if shown >= stage_frames and self.can_advance():
+            self.advance()
+        return True
+
+    def plan_timeline(self, stage_frames=TIMELINE_STAGE_FRAMES, end_frames=TIMELINE_END_FRAMES,
+                      max_frames=None, every=EXPORT_SEGMENT_FRAMES):
+        """Simulate the timeline without drawing, taking a snapshot() every `every` frames.
+
+        Returns the snapshots, the first one taken at frame 0, and the total
+        number of frames. Restoring a snapshot and calling run_timeline() with
+        the same arguments renders the frames from there on.
+        """
+        snapshots = []
+        while True:
+            if self.frame_count % every == 0:
+                snapshots.append(self.snapshot())
+            if not self.follow_timeline(stage_frames, end_frames, max_frames):
+                break
+            self.step(render=False)
+
+        if snapshots[-1]["frame_count"] == self.frame_count:
+            snapshots.pop()
+        return snapshots, self.frame_count
+
+    def snapshot(self) -> dict:
+        """The simulation state at the current frame, without caches or surfaces"""
+        return {
+            "frame_count": self.frame_count,
+            "seed": self.seed,
+            "rng": self.rng.getstate(),
+            "timeline": (self.timeline_stage, self.timeline_stage_start),
+            "stage_manager": self.stage_manager.snapshot(),
+            "particles": self.particle_system.snapshot(),
+            "end_sequence": self.end_sequence.snapshot(),
+        }
+
+    def restore(self, state: dict):
+        """Continue from a snapshot() taken from this or another simulation"""
+        self.frame_count = state["frame_count"]
+        self.seed = state["seed"]
+        self.rng.setstate(state["rng"])
+        self.timeline_stage, self.timeline_stage_start = state["timeline"]
+        self.stage_manager.restore(state["stage_manager"])
+        self.particle_system.restore(state["particles"])
+        self.end_sequence.restore(state["end_sequence"])
+
+        # Cached layers are rebuilt on the next frame
+        self.entity_layer_key = None
+        self.dirty_scene = None
@@ -0,0 +1,62 @@
+# sprite_cache.py
+import numpy as np
+import pygame
+
+
+class SpriteCache:
+    """Pre-rendered circle stamps, built once per (color, radius) and reused every frame"""
+
+    def __init__(self):
+        self._circles = {}
+        self._translucent = {}
+        self._discs = {}
+
+    def circle(self, color, radius: int):
+        key = (tuple(color), radius)
+        sprite = self._circles.get(key)
+        if sprite is None:
+            sprite = self._circles[key] = self._render_circle(key[0], radius)
+        return sprite
+
+    @staticmethod
+    def _render_circle(color, radius):
+        # Same layout as pygame.draw.circle centered at (radius + 1, radius + 1),
+        # so blitting at (x - radius - 1, y - radius - 1) gives identical pixels
+        size = radius * 2 + 2
+        colorkey = tuple(255 - channel for channel in color)
+        sprite = pygame.Surface((size, size))
+        sprite.fill(colorkey)
+        pygame.draw.circle(sprite, color, (radius + 1, radius + 1), radius)
+        sprite.set_colorkey(colorkey, pygame.RLEACCEL)
+
+        # Match the display format so blits need no per-pixel conversion
+        if pygame.display.get_surface() is not None:
+            sprite = sprite.convert()
+        return sprite
+
+    def translucent_circle(self, color, radius: int, alpha: int):
+        """Per-pixel alpha stamp, as drawn with pygame.draw.circle on an SRCALPHA surface"""
+        key = (tuple(color[:3]), radius, alpha)
+        sprite = self._translucent.get(key)
+        if sprite is None:
+            size = radius * 2 + 2
+            sprite = pygame.Surface((size, size), pygame.SRCALPHA)
+            pygame.draw.circle(sprite, (*key[0], alpha), (radius + 1, radius + 1), radius)
+            if pygame.display.get_surface() is not None:
+                sprite = sprite.convert_alpha()
+            self._translucent[key] = sprite
+        return sprite
+
+    def disc_offsets(self, radius: int):
+        """Pixel offsets from the center covered by a circle of this radius, as (dx, dy) arrays"""
+        offsets = self._discs.get(radius)
+        if offsets is None:
+            # Rasterized by the same pygame.draw.circle call as the sprites
+            stamp = self._render_circle((255, 255, 255), radius)
+            covered = pygame.surfarray.array_colorkey(stamp) > 0
+            dx, dy = np.nonzero(covered)
+            offsets = self._discs[radius] = (dx - radius - 1, dy - radius - 1)
+        return offsets
+
+    def __len__(self):
+        return len(self._circles) + len(self._translucent)
@@ -49,16 +49,21 @@ class StageManager:
         self.machine_attack_count = 0
         self.end_sequence_timer = 0
 
-    def update_warning(self):
-        if self.warning_increasing:
-            self.warning_alpha = min(self.warning_alpha + 2, 100)
-        else:
-            self.warning_alpha = max(self.warning_alpha - 2, 30)
+    def update_warning(self, frames=1):
+        # Once in the 30-100 range the pulse repeats every 70 frames
+        if self.warning_alpha >= 30:
+            frames %= 70
+
+        for _ in range(frames):
+            if self.warning_increasing:
+                self.warning_alpha = min(self.warning_alpha + 2, 100)
+            else:
+                self.warning_alpha = max(self.warning_alpha - 2, 30)
 
-        if self.warning_alpha == 100:
-            self.warning_increasing = False
-        elif self.warning_alpha == 30:
-            self.warning_increasing = True
+            if self.warning_alpha == 100:
+                self.warning_increasing = False
+            elif self.warning_alpha == 30:
+                self.warning_increasing = True
 
     def handle_rich_attack(self):
         self.rich_attack_count += 1
@@ -97,4 +102,11 @@ class StageManager:
             self.reset()
 
         self.end_sequence_timer = 0
-        self.update_circle_sizes()
\ No newline at end of file
+        self.update_circle_sizes()
+
+    def snapshot(self) -> dict:
+        """Copy of the stage, flags, counters and radii"""
+        return dict(vars(self))
+
+    def restore(self, state: dict):
+        vars(self).update(state)
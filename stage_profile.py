@@ -0,0 +1,100 @@
+# stage_profile.py
+"""Function-level profiles of single stages.
+
+A StageProfiler is armed for one stage: it starts when that stage begins
+and stops when it ends, writing `profile-<stage>-seed<seed>.pstats` for
+cProfile, or `.folded` collapsed stacks from a stack sampler, which
+flamegraph.pl, speedscope and inferno read directly. The sampler costs
+the frame loop almost nothing; cProfile gives exact call counts but slows
+every Python call while it runs. Profiles must be started from the main
+thread.
+"""
+import cProfile
+import os
+import signal
+from collections import Counter
+
+from constants import PROFILE_SAMPLE_INTERVAL
+
+# The sampler needs interval timers, which Windows lacks
+SAMPLER_AVAILABLE = hasattr(signal, "setitimer")
+
+
+class StackSampler:
+    """Counts the main thread's stacks, sampled every `interval` seconds of CPU time.
+
+    A SIGPROF timer interrupts the process and the handler records the
+    interrupted stack, so time spent inside a C call such as a blit is
+    charged to the Python function that made it.
+    """
+
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self._previous_handler = None
+
+    def enable(self):
+        self._previous_handler = signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def disable(self):
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, self._previous_handler)
+
+    def _sample(self, signum, frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            module = os.path.splitext(os.path.basename(code.co_filename))[0]
+            names.append(f"{module}.{code.co_name}")
+            frame = frame.f_back
+        self.stacks[";".join(reversed(names))] += 1
+
+    def dump_stats(self, path: str):
+        """Write one `root;...;leaf count` line per sampled stack"""
+        with open(path, "w") as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f"{stack} {count}\n")
+
+
+class StageProfiler:
+    """Profiles every visit to `stage`; with no stage, profiles only what start() begins"""
+
+    def __init__(self, stage, seed, directory: str = ".", sampler: bool = False):
+        self.stage = stage
+        self.seed = seed
+        self.directory = directory
+        self.sampler = sampler
+        self.paths = []
+        self.profiled_stage = None
+        self._profile = None
+
+    @property
+    def running(self) -> bool:
+        return self._profile is not None
+
+    def stage_changed(self, stage):
+        """Start or stop at a stage change; returns the written path when one stops"""
+        path = None
+        if self.running and stage != self.profiled_stage:
+            path = self.stop()
+        if not self.running and stage == self.stage:
+            self.start(stage)
+        return path
+
+    def start(self, stage):
+        """Profile from now until `stage` ends or stop() is called"""
+        self.profiled_stage = stage
+        self._profile = StackSampler() if self.sampler else cProfile.Profile()
+        self._profile.enable()
+
+    def stop(self) -> str:
+        """Stop and write the profile; returns its path"""
+        profile, self._profile = self._profile, None
+        profile.disable()
+        extension = "folded" if self.sampler else "pstats"
+        path = os.path.join(self.directory, f"profile-{self.profiled_stage}-seed{self.seed}.{extension}")
+        os.makedirs(self.directory, exist_ok=True)
+        profile.dump_stats(path)
+        self.paths.append(path)
+        return path
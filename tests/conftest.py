@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Tests draw offscreen and import the modules from the repository root
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,33 @@
+import tracemalloc
+
+import allocation_tracking
+from allocation_tracking import AllocationTracker, PARTICLE_ALLOCATIONS
+from constants import TRADITIONAL
+
+
+def _track_one_frame():
+    tracker = AllocationTracker()
+    tracker.start(TRADITIONAL)
+    tracker.begin()
+    kept = [bytearray(4096) for _ in range(16)]
+    tracker.end(PARTICLE_ALLOCATIONS)
+    tracker.end_frame()
+    report = tracker.stop()
+    del kept
+    return report
+
+
+def test_tracks_a_frame():
+    report = _track_one_frame()
+    used = report["stages"][TRADITIONAL]["subsystems"][PARTICLE_ALLOCATIONS]
+    assert used["max_bytes"] >= 16 * 4096
+
+
+def test_falls_back_to_net_bytes_without_reset_peak(monkeypatch):
+    # Python 3.7 and 3.8 have no tracemalloc.reset_peak()
+    monkeypatch.delattr(tracemalloc, "reset_peak", raising=False)
+    monkeypatch.setattr(allocation_tracking, "PEAK_AVAILABLE", False)
+    report = _track_one_frame()
+    used = report["stages"][TRADITIONAL]["subsystems"][PARTICLE_ALLOCATIONS]
+    assert used["max_bytes"] >= 16 * 4096
+    assert report["includes_temporaries"] is False
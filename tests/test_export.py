@@ -0,0 +1,61 @@
+import hashlib
+import os
+
+import pygame
+
+from export import export_segments
+from simulation import EconomySimulation
+
+SEED = 7
+STAGE_FRAMES = 40
+END_FRAMES = 40
+WINDOW_FRAMES = 10  # Frames compared after each restored snapshot
+
+
+def _straight_run(max_frames=None):
+    """Digest of every frame of an uninterrupted headless run"""
+    simulation = EconomySimulation(headless=True, seed=SEED)
+    frames = []
+    simulation.run_timeline(STAGE_FRAMES, END_FRAMES, max_frames,
+                            lambda screen: frames.append(_digest(screen)))
+    return frames
+
+
+def _digest(surface):
+    return hashlib.sha1(pygame.image.tostring(surface, "RGB")).hexdigest()
+
+
+def test_restored_snapshots_render_the_same_frames():
+    expected = _straight_run()
+    planner = EconomySimulation(headless=True, seed=SEED)
+    snapshots, frames = planner.plan_timeline(STAGE_FRAMES, END_FRAMES, every=97)
+    assert frames == len(expected)
+
+    # A fresh simulation with another seed, so only the snapshot carries state;
+    # the first frames after each snapshot show whatever it left out
+    simulation = EconomySimulation(headless=True, seed=SEED + 1)
+    for snapshot in snapshots[1:]:
+        start = snapshot["frame_count"]
+        stop = min(start + WINDOW_FRAMES, frames)
+        simulation.restore(snapshot)
+        rendered = []
+        simulation.run_timeline(STAGE_FRAMES, END_FRAMES, stop, lambda screen: rendered.append(_digest(screen)))
+        assert rendered == expected[start:stop], f"frames from {start}"
+
+
+def test_parallel_export_matches_a_straight_run(tmp_path):
+    written = export_segments(str(tmp_path), SEED, workers=2, segment_frames=37,
+                              stage_frames=STAGE_FRAMES, end_frames=END_FRAMES, max_frames=150)
+    expected = _straight_run(150)
+    assert written == len(expected) == 150
+
+    pygame.init()
+    exported = [_digest(pygame.image.load(os.path.join(tmp_path, f"frame_{frame:05d}.png")))
+                for frame in range(written)]
+    pygame.quit()
+    assert exported == expected
+
+
+def test_export_without_frames(tmp_path):
+    assert export_segments(str(tmp_path), SEED, max_frames=0) == 0
+    assert os.listdir(tmp_path) == []
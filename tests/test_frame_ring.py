@@ -0,0 +1,86 @@
+import pygame
+import pytest
+
+from frame_ring import BLOCK, OVERWRITE, FrameRingReader, FrameRingWriter
+
+SLOTS = 4
+
+
+@pytest.fixture
+def surface():
+    pygame.init()
+    yield pygame.Surface((8, 6), 0, 32)
+    pygame.quit()
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "frames")
+
+
+def _write(writer, surface, frame):
+    surface.fill((frame, 0, 0))
+    return writer.write(surface)
+
+
+def _red(reader, pixels):
+    return int(reader.rgb(pixels)[0, 0, 0])
+
+
+def test_reader_keeping_up_without_release_drops_nothing(surface, path):
+    with FrameRingWriter.for_surface(path, surface, slots=SLOTS, policy=OVERWRITE) as writer, \
+            FrameRingReader(path) as reader:
+        for frame in range(20):
+            assert _write(writer, surface, frame)
+            sequence, pixels = reader.read(timeout=0)
+            assert sequence == frame
+            assert _red(reader, pixels) == frame
+            # Views into the mapping keep it from closing
+            del pixels
+        assert writer.dropped == 0
+
+
+def test_reader_keeping_up_under_block_drops_nothing(surface, path):
+    with FrameRingWriter.for_surface(path, surface, slots=SLOTS, policy=BLOCK, timeout=0) as writer, \
+            FrameRingReader(path) as reader:
+        for frame in range(20):
+            assert _write(writer, surface, frame)
+            assert reader.read(timeout=0)[0] == frame
+            reader.release()
+        assert writer.dropped == 0
+
+
+def test_overwrite_skips_lapped_frames(surface, path):
+    with FrameRingWriter.for_surface(path, surface, slots=SLOTS, policy=OVERWRITE) as writer, \
+            FrameRingReader(path) as reader:
+        assert reader.read(timeout=0) is None
+        for frame in range(10):
+            assert _write(writer, surface, frame)
+        assert writer.dropped == 10 - SLOTS
+
+        sequences = []
+        while True:
+            frame = reader.read(timeout=0)
+            if frame is None:
+                break
+            sequence, pixels = frame
+            assert _red(reader, pixels) == sequence
+            sequences.append(sequence)
+            del frame, pixels
+        assert sequences == list(range(10 - SLOTS, 10))
+
+
+def test_timed_out_block_write_drops_the_frame(surface, path):
+    with FrameRingWriter.for_surface(path, surface, slots=SLOTS, policy=BLOCK, timeout=0.01) as writer, \
+            FrameRingReader(path) as reader:
+        for frame in range(SLOTS):
+            assert _write(writer, surface, frame)
+        # Reading without releasing does not free a slot for a blocking writer
+        assert reader.read(timeout=0)[0] == 0
+        assert not _write(writer, surface, SLOTS)
+        assert writer.dropped == 1
+        assert writer.written == SLOTS
+
+        reader.release()
+        assert _write(writer, surface, SLOTS)
+        assert writer.dropped == 1
@@ -0,0 +1,55 @@
+import pygame
+import pytest
+
+from constants import BLUE, RED, WHITE
+from particles import FLOW_KIND, ParticleSystem
+
+
+@pytest.fixture
+def screen():
+    pygame.init()
+    yield pygame.Surface((200, 200))
+    pygame.quit()
+
+
+def test_killed_particle_is_not_drawn_or_counted(screen):
+    system = ParticleSystem()
+    system.spawn(20, 20, 180, 20, RED)
+    system.spawn(20, 100, 180, 100, BLUE)
+    system.update()
+
+    system.kill(0)
+    system.kill(0)
+    assert len(system) == 1
+    assert system.count_kind(FLOW_KIND) == 1
+    assert list(system) == [1]
+    assert len(system.boxes()[0]) == 1
+
+    screen.fill(WHITE)
+    system.draw(screen)
+    assert screen.get_at((23, 20))[:3] == WHITE
+    assert screen.get_at((23, 100))[:3] == BLUE
+
+    system.compact()
+    assert system.count == len(system) == 1
+
+
+def test_killed_particle_is_not_splatted(screen):
+    system = ParticleSystem(splat_threshold=1)
+    system.spawn(20, 20, 180, 20, RED)
+    system.spawn(20, 100, 180, 100, BLUE)
+    system.update()
+    system.kill(0)
+
+    screen.fill(WHITE)
+    system.draw(screen)
+    assert screen.get_at((23, 20))[:3] == WHITE
+    assert screen.get_at((23, 100))[:3] == BLUE
+
+
+def test_pool_grows_from_zero_capacity_up_to_the_cap():
+    system = ParticleSystem(capacity=0, max_particles=3)
+    for _ in range(4):
+        system.spawn(20, 20, 180, 20, RED)
+    assert len(system) == system.capacity == 3
+    assert (system.hits, system.misses, system.dropped) == (0, 3, 1)
@@ -0,0 +1,52 @@
+import random
+
+import numpy as np
+import pytest
+
+from constants import END_STATE, STAGE_NAMES
+from simulation import EconomySimulation
+
+# Frames each stage is shown before both simulations advance it
+STAGE_FRAMES = 120
+# Far more frames than the timeline takes, so a stalled end sequence fails the test
+MAX_FRAMES = 20000
+
+
+def assert_same_state(actual, expected, path="state"):
+    """Compare two snapshot() trees exactly, NumPy arrays included"""
+    if isinstance(expected, dict):
+        assert actual.keys() == expected.keys(), path
+        for key in expected:
+            assert_same_state(actual[key], expected[key], f"{path}[{key!r}]")
+    elif isinstance(expected, np.ndarray):
+        assert np.array_equal(actual, expected), path
+    else:
+        assert actual == expected, path
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_bulk_steps_match_single_steps(seed):
+    """update(n) leaves the state n calls of update() would, in every stage"""
+    single = EconomySimulation(headless=True, seed=seed)
+    bulk = EconomySimulation(headless=True, seed=seed)
+    chunks = random.Random(seed)
+    stages = set()
+    stage_start = 0
+
+    while not (single.stage_manager.stage == END_STATE and single.frame_count - stage_start >= STAGE_FRAMES):
+        assert single.frame_count < MAX_FRAMES, f"stuck in {single.stage_manager.stage}"
+        steps = chunks.choice([1, 2, 3, chunks.randint(4, 60), chunks.randint(60, 150)])
+        for _ in range(steps):
+            single.update()
+        bulk.update(steps)
+        assert_same_state(bulk.snapshot(), single.snapshot(), f"frame {single.frame_count}")
+
+        stage = single.stage_manager.stage
+        if stage not in stages:
+            stages.add(stage)
+            stage_start = single.frame_count
+        if single.frame_count - stage_start >= STAGE_FRAMES and single.can_advance():
+            single.advance()
+            bulk.advance()
+
+    assert stages == set(STAGE_NAMES)
@@ -0,0 +1,55 @@
+# text_cache.py
+from collections import OrderedDict
+from constants import TEXT_CACHE_SIZE
+
+
+class TextCache:
+    """Rendered text surfaces keyed by (font, text, color, antialias) with LRU eviction"""
+
+    def __init__(self, max_entries: int = TEXT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, key, create):
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = self._surfaces[key] = create()
+        while len(self._surfaces) > self.max_entries:
+            self._surfaces.popitem(last=False)
+            self.evictions += 1
+        return surface
+
+    def render(self, font, text: str, color, antialias: bool = True):
+        """Same as font.render(text, antialias, color), rendered once and reused.
+
+        The returned surface is shared, so callers must not modify it.
+        """
+        key = (font, text, tuple(color), antialias)
+        return self._lookup(key, lambda: font.render(text, antialias, color))
+
+    def render_faded(self, font, text: str, color, alpha, antialias: bool = True):
+        """Cached text with a surface alpha applied at blit time instead of re-rendering"""
+        key = (font, text, tuple(color), antialias, "faded")
+        surface = self._lookup(key, lambda: self.render(font, text, color, antialias).copy())
+        surface.set_alpha(alpha)
+        return surface
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._surfaces),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def clear(self):
+        self._surfaces.clear()
@@ -1,36 +1,48 @@
 # ui_manager.py
 import pygame
 from constants import *
+from text_cache import TextCache
 
 class UIManager:
-    def __init__(self, screen, font, small_font, big_font):
+    def __init__(self, screen, font, small_font, big_font, text_cache=None):
         self.screen = screen
         self.font = font
         self.small_font = small_font
         self.big_font = big_font
+        self.text_cache = text_cache if text_cache is not None else TextCache()
+
+        # Solid red overlay in the screen's format, built once; the pulse is
+        # applied as a surface alpha instead of per-pixel alpha
+        self.warning_surface = pygame.Surface((WIDTH, HEIGHT), 0, screen)
+        self.warning_surface.fill(RED)
 
     def draw_warning_overlay(self, stage, warning_alpha):
         """Draw warning overlay during unrest or machine takeover"""
         if stage in [UNREST, MACHINE_TAKEOVER]:
-            warning_surface = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-            warning_color = (255, 0, 0, warning_alpha)
-            pygame.draw.rect(warning_surface, warning_color, (0, 0, WIDTH, HEIGHT))
-
             warning_text = "CIVIL UNREST" if stage == UNREST else "MACHINE TAKEOVER"
-            text_surface = self.font.render(warning_text, True, RED)
+            text_surface = self.text_cache.render(self.font, warning_text, RED)
             text_rect = text_surface.get_rect(center=(WIDTH // 2, HEIGHT - 50))
 
-            self.screen.blit(warning_surface, (0, 0))
+            if warning_alpha > 0:
+                self.warning_surface.set_alpha(warning_alpha)
+                self.screen.blit(self.warning_surface, (0, 0))
             self.screen.blit(text_surface, text_rect)
 
     def draw_end_state_title(self, stage):
         """Draw title for end state"""
         if stage in [AI_ALIGNMENT, END_STATE]:
             title = STAGE_NAMES[stage]
-            text_surface = self.big_font.render(title, True, BLACK)
+            text_surface = self.text_cache.render(self.big_font, title, BLACK)
             text_rect = text_surface.get_rect(center=(WIDTH // 2, HEIGHT // 2))
             self.screen.blit(text_surface, text_rect)
 
+    def draw_time_scale(self, time_scale):
+        """Show the fast-forward speed in the top right corner while it is not 1x"""
+        if time_scale == 1:
+            return
+        text_surface = self.text_cache.render(self.small_font, f"{time_scale:g}x", BLACK)
+        self.screen.blit(text_surface, text_surface.get_rect(topright=(WIDTH - 10, 10)))
+
     def draw_info(self, stage):
         """Draw GDP and stage information"""
         # Skip info display for end sequence stages
@@ -53,7 +65,7 @@ class UIManager:
 
         gdp_color = RED if stage in [UNREST, MACHINE_TAKEOVER] else BLACK
         gdp_text = f"GDP: {gdp_values[stage]}"
-        gdp_surface = self.font.render(gdp_text, True, gdp_color)
+        gdp_surface = self.text_cache.render(self.font, gdp_text, gdp_color)
         self.screen.blit(gdp_surface, (10, HEIGHT - 40))
 
         # # Don't show stage name during end sequence
@@ -65,12 +77,12 @@ class UIManager:
         # Don't show stage name during end sequence
         if stage not in [MACHINE_SURVIVAL, MACHINE_REPLICATION]:
             mode_text = f"{STAGE_NAMES[stage]}"
-            text_surface = self.font.render(mode_text, True, BLACK)
+            text_surface = self.text_cache.render(self.font, mode_text, BLACK)
             text_width = text_surface.get_width()
             text_x = (WIDTH // 2) - (text_width // 2)  # Center horizontally
             self.screen.blit(text_surface, (text_x, 10))
 
             # Only show space bar instruction during normal stages
             instruction_text = "Press SPACE"
-            instruction_surface = self.font.render(instruction_text, True, BLACK)
+            instruction_surface = self.text_cache.render(self.font, instruction_text, BLACK)
             self.screen.blit(instruction_surface, (WIDTH - 170, HEIGHT - 40))
\ No newline at end of file